@@ -15,12 +15,23 @@ __date__ = "2017/09/13"
 __credits__ = ["Hajo Eicken", "Andy Mahoney", "Josh Jones"]
 __name__ = "seaice"
 
+import builtins
 import logging
 import numpy as np
 import pandas as pd
 
 import seaice.core.corestack
 import seaice.core.plot
+import seaice.core.aio
+import seaice.core.batch
+import seaice.core.catalog
+import seaice.core.collection
+import seaice.core.columnar
+import seaice.core.dedup
+import seaice.core.migrate
+import seaice.core.scan
+import seaice.core.shared
+import seaice.core.sync
 import seaice.property
 
 # import seaice.core.tool
@@ -41,17 +52,45 @@ class Core:
     """
     Core
     """
+    __slots__ = ['name', 'date', 'origin', 'lat', 'lon', '_ice_thickness', '_freeboard', '_snow_depth', '_collection',
+                 '_comments', '_profile', '_fragments', '_frozen', '_lazy_source', '_lazy_sheets', '_length',
+                 '_variables', 't_air', 't_snow_surface', 't_ice_surface', 't_water', 'protocol']
+
+    # shared by all the cores, no per instance logger
+    logger = logging.getLogger(__name__)
 
     def __getstate__(self):
-        d = self.__dict__.copy()
-        if 'logger' in d.keys():
-            d['logger'] = d['logger'].name
-        return d
+        self.finalize()
+        # length and variables are recomputed on demand
+        return {attr: getattr(self, attr) for attr in self.__slots__ if attr not in ['_length', '_variables']}
 
     def __setstate__(self, d):
-        if 'logger' in d.keys():
-            d['logger'] = logging.getLogger(d['logger'])
-        self.__dict__.update(d)
+        self._init_slots()
+        for attr, value in d.items():
+            if attr in self.__slots__:
+                object.__setattr__(self, attr, value)
+            # cores pickled before __slots__, with the public attributes
+            elif attr in ['profile', 'collection', 'comment', 'ice_thickness', 'freeboard', 'snow_depth']:
+                setattr(self, attr, value)
+
+    def _init_slots(self):
+        self._ice_thickness = np.array([np.nan])
+        self._freeboard = np.array([np.nan])
+        self._snow_depth = np.array([np.nan])
+        self._collection = set()
+        self._comments = []
+        self._profile = pd.DataFrame([])
+        self._fragments = []  # profiles added but not concatenated to _profile yet
+        self._frozen = False
+        self._lazy_source = None
+        self._lazy_sheets = []
+        self._length = None
+        self._variables = None
+        self.t_air = np.nan
+        self.t_snow_surface = np.nan
+        self.t_ice_surface = np.nan
+        self.t_water = np.nan
+        self.protocol = None
 
     def __init__(self, name, date, origin=np.nan, lat=np.nan, lon=np.nan, ice_thickness=np.nan, freeboard=np.nan,
                  snow_depth=np.nan):
@@ -73,8 +112,8 @@ class Core:
             np.array, ice thickness measured at the location of coring
         :return:
         """
-        self.logger = logging.getLogger(__name__)
         self.logger.debug('(%s) instance of Core created' % name)
+        self._init_slots()
         self.name = name
         self.date = date
         self.origin = origin
@@ -83,14 +122,184 @@ class Core:
         self.snow_depth = snow_depth
         self.freeboard = freeboard
         self.ice_thickness = ice_thickness
-        self.collection = [name]
-        self.comment = None
-        self.profile = pd.DataFrame([])
-        self.t_air = np.nan
-        self.t_snow_surface = np.nan
-        self.t_ice_surface = np.nan
-        self.t_water = np.nan
-        self.protocol = None
+        self._collection = {name}
+
+    # the seaice.property subpackage shadows the property builtin in this module
+    @builtins.property
+    def ice_thickness(self):
+        """
+        np.array of float, ice thickness measurements
+        """
+        return self._ice_thickness
+
+    @ice_thickness.setter
+    def ice_thickness(self, ice_thickness):
+        self._ice_thickness = np.atleast_1d(np.asarray(ice_thickness, dtype=float))
+
+    @builtins.property
+    def freeboard(self):
+        """
+        np.array of float, freeboard measurements
+        """
+        return self._freeboard
+
+    @freeboard.setter
+    def freeboard(self, freeboard):
+        self._freeboard = np.atleast_1d(np.asarray(freeboard, dtype=float))
+
+    @builtins.property
+    def snow_depth(self):
+        """
+        np.array of float, snow depth measurements
+        """
+        return self._snow_depth
+
+    @snow_depth.setter
+    def snow_depth(self, snow_depth):
+        self._snow_depth = np.atleast_1d(np.asarray(snow_depth, dtype=float))
+
+    @builtins.property
+    def collection(self):
+        """
+        list of string, sorted names of the cores of the collection
+        """
+        return sorted(self._collection)
+
+    @collection.setter
+    def collection(self, collection):
+        self._collection = set(collection)
+
+    @builtins.property
+    def comment(self):
+        """
+        string, comments separated by '; ', or None without comment
+        """
+        if not self._comments:
+            return None
+        return '; '.join(self._comments)
+
+    @comment.setter
+    def comment(self, comment):
+        self._comments = []
+        if comment is not None:
+            for c in comment.split('; '):
+                if c not in self._comments:
+                    self._comments.append(c)
+
+    @builtins.property
+    def profile(self):
+        """
+        pd.DataFrame, profiles of the core. For a lazy core, the variable sheets not read yet are read first.
+        """
+        if self._lazy_sheets:
+            self.load_variables()
+        self.finalize()
+        return self._profile
+
+    @profile.setter
+    def profile(self, profile):
+        self._fragments = []
+        self._profile = profile
+        self._length = None
+        self._variables = None
+
+    def finalize(self):
+        """
+        Concatenate the profiles added since the last call to the profile of the core, at once. Called when the profile
+        is read and at the end of the import of the variable sheets.
+        :return:
+            seaice.Core
+        """
+        if self._fragments:
+            self._profile = seaice.core.schema.concat_profiles([self._profile] + self._fragments, sort=False)
+            self._profile.reset_index(inplace=True, drop=True)
+            self._fragments = []
+            self._length = None
+            self._variables = None
+        return self
+
+    def freeze(self):
+        """
+        Finalize the profile of the core; further profiles are not added to a frozen core. For bulk importers, once the
+        variable sheets are read.
+        :return:
+            seaice.Core
+        """
+        self._frozen = True
+        return self.finalize()
+
+    def is_frozen(self):
+        """
+        :return:
+            boolean, True if the core is frozen
+        """
+        return self._frozen
+
+    def set_lazy(self, ic_path, sheets, version, v_ref='top', backend='openpyxl'):
+        """
+        Defer the reading of the variable sheets until their profile is requested
+        :param ic_path:
+            string, path to the xlsx ice core spreadsheet
+        :param sheets:
+            list of tuple (sheet name, list of variables or None for all variables of the sheet)
+        :param version:
+            spreadsheet version
+        :param v_ref:
+            'top' or 'bottom', vertical reference
+        :param backend:
+            'openpyxl' or 'xml', spreadsheet reader
+        :return:
+        """
+        self._lazy_source = (ic_path, version, v_ref, backend)
+        self._lazy_sheets = list(sheets)
+
+    def pending_sheets(self):
+        """
+        :return:
+            list of string, variable sheets not read yet
+        """
+        return [sheet for sheet, _ in self._lazy_sheets]
+
+    def load_variables(self, variables=None):
+        """
+        Read the variable sheets not read yet of a lazy core
+        :param variables:
+            list of string, variables to read. If None, all remaining sheets are read.
+        :return:
+        """
+        if not self._lazy_sheets:
+            return
+        if variables is None:
+            sheets = self._lazy_sheets
+        else:
+            if not isinstance(variables, list):
+                variables = [variables]
+            sheets = [(sheet, sheet_variables) for sheet, sheet_variables in self._lazy_sheets
+                      if (sheet_variables is None and
+                          any(seaice.core.variable_2_sheet.get(variable) == sheet for variable in variables)) or
+                      (sheet_variables is not None and set(sheet_variables) & set(variables))]
+        if sheets:
+            self._lazy_sheets = [sheet for sheet in self._lazy_sheets if sheet not in sheets]
+            ic_path, version, v_ref, backend = self._lazy_source
+            seaice.core.read_lazy_profiles(self, ic_path, sheets, version=version, v_ref=v_ref, backend=backend)
+
+    def get_profile(self, variables=None):
+        """
+        :param variables:
+            string or list of string. If None, return the profiles of all variables
+        :return:
+            pd.DataFrame, profiles of the variables. For a lazy core, only the sheets holding the variables are read.
+        """
+        if variables is None:
+            return self.profile
+        if not isinstance(variables, list):
+            variables = [variables]
+        self.load_variables(variables)
+        self.finalize()
+        if 'variable' in self._profile:
+            return self._profile[self._profile.variable.isin(variables)]
+        else:
+            return self._profile
 
     def add_to_collection(self, core_list):
         """
@@ -98,13 +307,9 @@ class Core:
         :return:
         """
         if isinstance(core_list, list):
-            for core in core_list:
-                if core not in self.collection:
-                    self.collection.append(core)
+            self._collection.update(core_list)
         else:
-            if core_list not in self.collection:
-                self.collection.append(core_list)
-        self.collection = sorted(self.collection)
+            self._collection.add(core_list)
 
     def remove_core(self, core):
         """
@@ -121,37 +326,37 @@ class Core:
         :return:
         """
         if isinstance(core_list, list):
-            for core in core_list:
-                if core in self.collection:
-                    self.collection.remove(core)
+            self._collection.difference_update(core_list)
         else:
-            if core_list in self.collection:
-                self.collection.remove(core_list)
-        self.collection = sorted(self.collection)
+            self._collection.discard(core_list)
 
     def add_comment(self, comment):
         """
         :param comment:
         :return:
         """
-        if comment is not None:
-            if self.comment is None:
-                self.comment = comment
-            # add comment only if the comment is different to any other comment
-            elif comment not in self.comment.split('; '):
-                self.comment += '; ' + comment
+        # add comment only if the comment is different to any other comment
+        if comment is not None and comment not in self._comments:
+            self._comments.append(comment)
 
     def length(self):
-        if 'length' in self.profile:
-            return self.profile.length.unique()
-        else:
-            return np.array([]).astype(str)
+        # cached until the profile changes
+        if self._length is None:
+            if 'length' in self.profile:
+                self._length = self.profile.length.unique()
+            else:
+                self._length = np.array([]).astype(str)
+        return self._length
 
     def variables(self):
-        if 'variable' in self.profile:
-            return self.profile.variable.unique()
-        else:
-            return np.array([]).astype(str)
+        # cached until the profile changes
+        if self._variables is None:
+            if 'variable' in self.profile:
+                # variable is categorical, unique() returns only the variables of the profile
+                self._variables = np.asarray(self.profile.variable.unique())
+            else:
+                self._variables = np.array([]).astype(str)
+        return self._variables
 
     def del_variable(self, variable):
         """
@@ -159,7 +364,6 @@ class Core:
             str, variable to delete
         :return:
         """
-        self.variables.remove(variable)
         self.profile = self.profile[~self.profile.variable.str.contains(variable)]
 
     def del_profile(self, core):
@@ -213,13 +417,16 @@ class Core:
         :param snow_depth:
         :return:
         """
-        self.snow_depth = np.concatenate(self.snow_depth, [snow_depth])
+        self.snow_depth = np.append(self.snow_depth, snow_depth)
 
     def add_profile(self, profile):
         """
+        Add a profile to the core. The profiles are buffered and concatenated at once by finalize.
         :param profile:
             pd.DataFrame, profile to add
         :return:
         """
-        self.profile = self.profile.append(profile, sort=False)
-        self.profile.reset_index(inplace=True, drop=True)
+        if self._frozen:
+            self.logger.error('(%s) core is frozen, profile not added' % self.name)
+            return
+        self._fragments.append(profile)
@@ -17,7 +17,10 @@ __comment__ = "loadxl.py contained function to import ice core data from xlsx sp
 __CoreVersion__ = 1.1
 
 import datetime
+import hashlib
+import io
 import logging
+import multiprocessing
 import os
 
 import dateutil
@@ -25,29 +28,23 @@ import numpy as np
 import openpyxl
 import pandas as pd
 import seaice
+import seaice.core.cache
+from seaice.core.collection import prune_collections
+from seaice.core.dedup import dedup_ic_list
+from seaice.core.schema import constant_categorical, get_plan, to_float, variable_sheets
+from seaice.core.sheet import MemoryWorkbook, SheetBlock, read_block
+from seaice.core.timing import NULL_TIMER, ImportTimer
+from seaice.core.xlsx import XlsxWorkbook
 
-__all__ = ["import_ic_path", "import_ic_list", "import_ic_sourcefile", "list_ic", "list_ic_path", "make_ic_sourcefile"]
+__all__ = ["import_ic_path", "import_ic_list", "import_ic_sourcefile", "iter_ic_list", "iter_ic_sourcefile", "list_ic",
+           "list_ic_path", "make_ic_sourcefile"]
 
-variable_2_sheet = {'temperature': 'T_ice',
-                    'salinity': 'S_ice',
-                    'conductivity': 'S_ice',
-                    'specific conductance': 'S_ice',
-                    'd18O': 'S_ice',
-                    'dD': 'S_ice',
-                    'Vf_oil': 'Vf_oil', 'oil volume fraction': 'Vf_oil',  # MOSIDEO project
-                    'Wf_oil': 'Wf_oil', 'oil weight fraction': 'Vf_oil',  # MOSIDEO project
-                    'oil content': 'oil_content',  # CMI project
-                    'oil mass': 'Vf_oil', 'm_oil': 'Vf_oil'
-                    # 'seawater': 'seawater',
-                    # 'sediment': 'sediment',
-                    # 'Chla': 'algal_pigment',
-                    # 'chlorophyl a': 'algal_pigment',
-                    # 'Phae': 'algal_pigment'
-                    }
+# variable: sheet of the ice core spreadsheet, see seaice.core.schema to add a variable
+variable_2_sheet = variable_sheets(__CoreVersion__)
 
 
-
-def import_ic_path(ic_path, variables=None, v_ref='top'):
+def import_ic_path(ic_path, variables=None, v_ref='top', cache_dir=None, lazy=False, backend='openpyxl', update=False,
+                   timer=None, source=None, f_hash=None):
     """
     :param ic_path:
         string, path to the xlsx ice core spreadsheet
@@ -55,16 +52,64 @@ def import_ic_path(ic_path, variables=None, v_ref='top'):
         list of string, variables to import. If not defined, all variable will be imported.
     :param v_ref:
         'top' or 'bottom', vertical reference. top for ice/snow or ice/air surface, bottom for ice/water interface
+    :param cache_dir:
+        string, default None. Path to the cache directory. If defined, the parsed core is loaded from the cache when the
+        file content, the variables and v_ref are unchanged, and stored into the cache otherwise.
+    :param lazy:
+        boolean, default False. If True, only the summary sheet is read. Variable sheets are read the first time the
+        profile of the core, or the profile of one of their variables, is requested. Lazy cores are not stored in the
+        cache.
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader. 'xml' streams the sheet xml out of the xlsx archive
+        without building openpyxl cell objects.
+    :param update:
+        boolean, default False. If True, spreadsheet of previous version are updated on disk to the latest version
+        (__CoreVersion__) before being read. Otherwise, they are updated in memory and the file is left unchanged.
+    :param timer:
+        ImportTimer, default None. If defined, the wall time and row count of each import stage are recorded in timer
+    :param source:
+        bytes, default None. Content of the file ic_path, if already read. The spreadsheet is then read from source;
+        ic_path is still used to read the variable sheets of a lazy core and to update the file on disk.
+    :param f_hash:
+        string, default None. Hash of the content of the file ic_path, if already computed by
+        seaice.core.cache.file_hash. The file is then not hashed again to build the cache key.
     :return:
     """
+    if timer is None:
+        timer = NULL_TIMER
+    with timer.file(ic_path), timer.stage('total'):
+        return _import_ic_path(ic_path, variables=variables, v_ref=v_ref, cache_dir=cache_dir, lazy=lazy,
+                               backend=backend, update=update, timer=timer, source=source,
+                               f_hash=f_hash)
+
+
+def _import_ic_path(ic_path, variables=None, v_ref='top', cache_dir=None, lazy=False, backend='openpyxl',
+                    update=False, timer=NULL_TIMER, source=None, f_hash=None):
+    """
+    see import_ic_path
+    """
     logger = logging.getLogger(__name__)
 
-    if not os.path.exists(ic_path):
+    if source is None and not os.path.exists(ic_path):
         logger.error("%s does not exists in core directory" % ic_path.split('/')[-1])
 
-    wb = openpyxl.load_workbook(filename=ic_path)  # load the xlsx spreadsheet
+    if cache_dir is not None:
+        with timer.stage('cache') as record:
+            if f_hash is None and source is not None:
+                f_hash = hashlib.sha1(source).hexdigest()
+            key = seaice.core.cache.cache_key(ic_path, variables=variables, v_ref=v_ref, f_hash=f_hash)
+            core = seaice.core.cache.load_core(cache_dir, key)
+            if core is not None:
+                record.rows = core.profile.__len__()
+                return core
+
+    with timer.stage('load_workbook'):
+        # load the xlsx spreadsheet
+        wb = load_workbook(ic_path if source is None else io.BytesIO(source), backend=backend)
     ws_name = wb.sheetnames
-    ws_summary = wb['summary']  # load the data from the summary sheet
+    with timer.stage('summary', 'summary') as record:
+        ws_summary = SheetBlock.from_worksheet(wb['summary'])  # load the data from the summary sheet
+        record.rows = ws_summary.max_row
 
     name = ws_summary['C21'].value
 
@@ -73,14 +118,138 @@ def import_ic_path(ic_path, variables=None, v_ref='top'):
     else:
         logger.error("(%s) ice core spreadsheet version not unavailable" % name)
 
+    file_version = version
     if version < __CoreVersion__:
-        update_spreadsheet(ic_path, v_ref=v_ref)
-        logger.info("Updating ice core spreadsheet %s to last version (%s)" % (name, str(__CoreVersion__)))
-        wb = openpyxl.load_workbook(filename=ic_path)  # load the xlsx spreadsheet
+        if update:
+            wb.close()
+            update_spreadsheet(ic_path, v_ref=v_ref)
+            logger.info("Updating ice core spreadsheet %s to last version (%s)" % (name, str(__CoreVersion__)))
+            wb = load_workbook(ic_path, backend=backend)  # load the xlsx spreadsheet
+            file_version = __CoreVersion__
+        else:
+            logger.info("(%s) reading ice core spreadsheet version %s as version %s"
+                        % (name, str(version), str(__CoreVersion__)))
+            with timer.stage('migrate'):
+                wb, version = migrate_workbook(wb, v_ref=v_ref)
         ws_name = wb.sheetnames
-        ws_summary = wb['summary']  # load the data from the summary sheet
+        ws_summary = SheetBlock.from_worksheet(wb['summary'])  # load the data from the summary sheet
         version = ws_summary['C3'].value
 
+    with timer.stage('read_summary', 'summary'):
+        core = read_summary(ws_summary)
+
+    # variable
+    if variables is None:
+        sheets = [(sheet, None) for sheet in ws_name
+                  if (sheet not in ['summary', 'abreviation', 'locations', 'lists', 'Vf_oil_calculation']) and
+                  (sheet.lower().find('fig') == -1)]
+    else:
+        if not isinstance(variables, list):
+            if variables.lower().find('state variable')+1:
+                variables = ['temperature', 'salinity']
+            else:
+                variables = [variables]
+        logger.info("(%s) Variables are %s" % (name, ', '.join(variables)))
+
+        sheets = []
+        for variable in variables:
+            if variable_2_sheet[variable] in ws_name:
+                sheets.append((variable_2_sheet[variable], [variable]))
+            else:
+                logger.info('\tsheet %s does not exists' % variable)
+
+    if lazy:
+        # version of the file on disk, the variable sheets are updated in memory when read
+        core.set_lazy(ic_path, sheets, version=file_version, v_ref=v_ref, backend=backend)
+        logger.info('\t(%s) variable sheets %s will be read on demand' % (name, ", ".join([s[0] for s in sheets])))
+    else:
+        read_profiles(core, wb, sheets, version=version, v_ref=v_ref, ic_path=ic_path, timer=timer)
+        if variables is None:
+            if core.variables().__len__() < 1:
+                logger.info('(%s) no variable to import' % name)
+            else:
+                logger.info('\t(%s) variables %s imported with success' % (name, ", ".join(core.variables())))
+
+    wb.close()
+
+    # weather
+    # TODO:adding a weather class and reading the information
+
+    if cache_dir is not None and not lazy:
+        with timer.stage('save_cache'):
+            seaice.core.cache.save_core(cache_dir, key, core)
+
+    return core
+
+
+def load_workbook(ic_path, backend='openpyxl'):
+    """
+    Open an ice core spreadsheet in read-only mode
+
+    :param ic_path:
+        string or file-like object, xlsx ice core spreadsheet
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader
+    :return:
+        openpyxl.workbook or XlsxWorkbook
+    """
+    logger = logging.getLogger(__name__)
+
+    if backend == 'xml':
+        return XlsxWorkbook(ic_path)
+    elif backend != 'openpyxl':
+        logger.warning("backend %s unknown, using openpyxl" % backend)
+    return openpyxl.load_workbook(filename=ic_path, read_only=True)
+
+
+def _read_measurements(ws_summary, row, name, label):
+    """
+    Read the measurements of a row of the summary sheet, from column C to the first empty cell
+
+    :param ws_summary:
+        openpyxl.worksheet or SheetBlock, summary sheet of the ice core spreadsheet
+    :param row:
+        int, row of the measurements
+    :param name:
+        string, core name, used for logging
+    :param label:
+        string, measurement name, used for logging
+    :return:
+        np.array of float, [np.nan] if the first measurement is not a number. Cells which are not a number are nan.
+    """
+    logger = logging.getLogger(__name__)
+
+    if not isinstance(ws_summary.cell(row=row, column=3).value, (float, int)):
+        return np.array([np.nan])
+
+    n_col = 1
+    while ws_summary.cell(row=row, column=3+n_col).value is not None:
+        n_col += 1
+
+    # the array is allocated at once, instead of growing with each measurement
+    values = np.full(n_col, np.nan)
+    for ii_col in range(n_col):
+        value = ws_summary.cell(row=row, column=3+ii_col).value
+        if isinstance(value, (float, int)):
+            values[ii_col] = value
+        else:
+            logger.info("\t(%s) %s cell %s not a float" % (name, label,
+                                                           openpyxl.utils.get_column_letter(3+ii_col)+str(row)))
+    return values
+
+
+def read_summary(ws_summary):
+    """
+    Read the core metadata from the summary sheet
+
+    :param ws_summary:
+        openpyxl.worksheet or SheetBlock, summary sheet of the ice core spreadsheet
+    :return:
+        seaice.Core, core without profile
+    """
+    logger = logging.getLogger(__name__)
+
+    name = ws_summary['C21'].value
     n_row_collection = 22
     logger.info("importing data for %s" % name)
 
@@ -117,42 +286,9 @@ def import_ic_path(ic_path, variables=None, v_ref='top'):
         lat = np.nan
         lon = np.nan
 
-    if isinstance(ws_summary['C9'].value, (float, int)):
-        snow_depth = np.array([ws_summary['C9'].value]).astype(float)
-        n_snow = 1
-        while ws_summary.cell(row=9, column=3+n_snow).value is not None:
-            snow_depth = np.concatenate((snow_depth, np.array([ws_summary.cell(row=9, column=3+n_snow).value])))
-            n_snow +=1
-            snow_depth = pd.to_numeric(snow_depth, errors='coerce')
-    else:
-        snow_depth = np.array([np.nan])
-
-    if isinstance(ws_summary['C10'].value, (float, int)):
-        freeboard = np.array([ws_summary['C10'].value])
-        n_temp = 1
-        while ws_summary.cell(row=10, column=3+n_temp).value is not None:
-            if isinstance(ws_summary.cell(row=10, column=3+n_temp).value, (float, int)):
-                freeboard = np.concatenate((freeboard, np.array([ws_summary.cell(row=10, column=3 + n_snow).value])))
-            else:
-                logger.info("(%s)\tfreeboard cell %s not a float" % (name,
-                                                                            openpyxl.utils.get_column_letter(3 + n_temp)+str(9)))
-            n_temp += 1
-        freeboard = pd.to_numeric(freeboard, errors='coerce')
-    else:
-        freeboard = np.array([np.nan])
-
-    if isinstance(ws_summary['C11'].value, (float, int)):
-        ice_thickness = np.array([ws_summary['C11'].value])
-        n_temp = 1
-        while ws_summary.cell(row=11, column=3+n_temp).value:
-            if isinstance(ws_summary.cell(row=11, column=3+n_temp).value, (float, int)):
-                ice_thickness = np.concatenate((ice_thickness, np.array([ws_summary.cell(row=11, column=3+n_snow).value])))
-            else:
-                logger.info("\t(%s) ice_thickness cell %s not a float" % (name, openpyxl.utils.get_column_letter(3+n_temp)+str(9)))
-            n_temp += 1
-        ice_thickness = pd.to_numeric(ice_thickness, errors='coerce')
-    else:
-        ice_thickness = np.array([np.nan])
+    snow_depth = _read_measurements(ws_summary, 9, name, 'snow_depth')
+    freeboard = _read_measurements(ws_summary, 10, name, 'freeboard')
+    ice_thickness = _read_measurements(ws_summary, 11, name, 'ice_thickness')
 
     core = seaice.Core(name, date, origin, lat, lon, ice_thickness, freeboard, snow_depth)
 
@@ -183,99 +319,205 @@ def import_ic_path(ic_path, variables=None, v_ref='top'):
     if ws_summary['C33'].value is not None:
         core.add_comment(ws_summary['C33'].value)
 
-    # variable
-    if variables is None:
-        sheets = [sheet for sheet in ws_name if (sheet not in ['summary', 'abreviation', 'locations', 'lists', 'Vf_oil_calculation']) and
-                     (sheet.lower().find('fig') == -1)]
-        core_flag = []
-        for sheet in sheets:
-            ws_variable = wb[sheet]
-            profile = read_variable(ws_variable, variables=None, version=version, v_ref=v_ref)
+    return core
+
+
+def read_profiles(core, wb, sheets, version=__CoreVersion__, v_ref='top', ic_path=None, timer=NULL_TIMER):
+    """
+    Read the variable sheets and add the profiles to the core
+
+    :param core:
+        seaice.Core
+    :param wb:
+        openpyxl.workbook
+    :param sheets:
+        list of tuple (sheet name, list of variables). If the list of variables is None, all the variables of the sheet
+        are read.
+    :param version:
+        spreadsheet version
+    :param v_ref:
+        top, or bottom
+    :param ic_path:
+        string, path to the ice core spreadsheet, used for logging
+    :param timer:
+        ImportTimer, default NULL_TIMER. Timer recording the read_variable and add_profile stages of each sheet, and the
+        finalize stage
+    :return:
+        seaice.Core
+    """
+    logger = logging.getLogger(__name__)
+
+    for sheet, sheet_variables in sheets:
+        with timer.stage('read_variable', sheet) as record:
+            profile = read_variable(wb[sheet], variables=sheet_variables, version=version, v_ref=v_ref, timer=timer)
+            record.rows = sum([profile[variable][0].__len__() for variable in profile])
+        if sheet_variables is not None and profile.keys().__len__() == 0:
+            logger.warning('\t(%s) no data exist for %s' % (core.name, ', '.join(sheet_variables)))
+        with timer.stage('add_profile', sheet) as record:
+            record.rows = 0
             for variable in profile.keys():
                 if not profile[variable][1] == core.name:
                     logger.error('\t(%s) core name %s and profile name %s does not match'
-                                        % (ic_path, core.name, profile[variable][1]))
+                                 % (ic_path, core.name, profile[variable][1]))
                 else:
                     core.add_profile(profile[variable][0])
-                    if core.name not in core_flag and profile[variable][3] is not None and\
-                            ~np.isnan(profile[variable][3]):
-                        core_flag.append(core.name)
                     core.add_comment(profile[variable][2])
+                    record.rows += profile[variable][0].__len__()
+    with timer.stage('finalize'):
+        core.finalize()
+    return core
 
-        if core.variables().__len__() < 1:
-            logger.info('(%s) no variable to import' % name)
-        else:
-            logger.info('\t(%s) variables %s imported with success' % (name, ", ".join(core.variables())))
-    else:
-        if not isinstance(variables, list):
-            if variables.lower().find('state variable')+1:
-                variables = ['temperature', 'salinity']
-            else:
-                variables = [variables]
-        logger.info("(%s) Variables are %s" % (name, ', '.join(variables)))
 
-        core_flag = []
-        for variable in variables:
-            if variable_2_sheet[variable] in ws_name:
-                ws_variable = wb[variable_2_sheet[variable]]
-                profile = read_variable(ws_variable, variables=variable, version=version, v_ref=v_ref)
-                if profile.keys().__len__() == 0:
-                    logger.warning('\t(%s) no data exist for %s' % (core.name, variable))
-                elif profile[variable][1] is not core.name:
-                    logger.error('\t(%s) core name %s and profile name %s does not match'
-                                        % (ic_path, core.name, profile[variable][1]))
-                else:
-                    core.add_profile(profile[variable][0])
-                    if core.name not in core_flag and profile[variable][3] is not None and ~np.isnan(
-                            profile[variable][3]):
-                        core_flag.append(core.name)
-                    core.add_comment(profile[variable][2])
-            else:
-                logger.info('\tsheet %s does not exists' % variable)
+def read_lazy_profiles(core, ic_path, sheets, version=__CoreVersion__, v_ref='top', backend='openpyxl'):
+    """
+    Open the ice core spreadsheet and read the variable sheets of a core imported with lazy=True
 
-    # weather
-    # TODO:adding a weather class and reading the information
+    :param core:
+        seaice.Core
+    :param ic_path:
+        string, path to the xlsx ice core spreadsheet
+    :param sheets:
+        list of tuple (sheet name, list of variables)
+    :param version:
+        spreadsheet version
+    :param v_ref:
+        top, or bottom
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader
+    :return:
+        seaice.Core
+    """
+    logger = logging.getLogger(__name__)
+    logger.info("(%s) reading variable sheets %s" % (core.name, ", ".join([s[0] for s in sheets])))
 
+    wb = load_workbook(ic_path, backend=backend)
+    if version < __CoreVersion__:
+        wb, version = migrate_workbook(wb, v_ref=v_ref)
+    read_profiles(core, wb, sheets, version=version, v_ref=v_ref, ic_path=ic_path)
+    wb.close()
     return core
 
 
-def import_ic_list(ic_list, variables=None, v_ref='top'):
+def migrate_workbook(wb, v_ref='top'):
+    """
+    Update an ice core spreadsheet of a previous version to the latest version (__CoreVersion__) in memory, without
+    modifying the file
+
+    :param wb:
+        openpyxl.workbook or XlsxWorkbook, ice core spreadsheet opened in read-only mode
+    :param v_ref:
+        'top' or 'bottom', vertical reference written in the variable sheets
+    :return:
+        tuple (MemoryWorkbook, version)
+    """
+    wb = MemoryWorkbook(wb)
+    version = upgrade_workbook(wb, v_ref=v_ref)
+    return wb, version
+
+
+def import_ic_list(ic_list, variables=None, v_ref='top', n_workers=1, cache_dir=None, lazy=False, backend='openpyxl',
+                   timer=None, duplicates=None):
     """
     :param ic_list:
             array, array contains absolute filepath for the cores
     :param variables:
     :param v_ref:
         top, or bottom
+    :param n_workers:
+        int or None, default 1. Number of worker processes used to import the cores. If None, use all available
+        cpu. Cores are returned in the order of ic_list, whatever the number of worker.
+    :param cache_dir:
+        string, default None. Path to the cache directory of parsed cores. Only new or modified files are parsed.
+    :param lazy:
+        boolean, default False. If True, only the summary sheets are read; variable sheets are read on demand. Cores
+        with variable sheets are kept even if the sheets turn out to be empty.
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader, see import_ic_path
+    :param timer:
+        ImportTimer, default None. If defined, the wall time and row count of each stage, sheet and file are recorded
+        in timer, see seaice.core.timing
+    :param duplicates:
+        'first', 'last', 'newest', 'skip' or None, default None. If defined, byte-identical copies of a file are
+        imported once, and among different files with the same core name only the file chosen by the policy is
+        imported, see seaice.core.dedup
     """
     logger = logging.getLogger(__name__)
 
     ic_dict = {}
     inexisting_ic_list = []
-    for ic_path in ic_list:
-        if not os.path.exists(ic_path):
-            logger.warning("%s does not exists in core directory" % ic_path.split('/')[-1])
-            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
-        else:
-            ic_data = import_ic_path(ic_path, variables=variables, v_ref=v_ref)
-            if ic_data.variables().size is 0 :
-                inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
-                logger.warning("%s have no properties profile" % (ic_data.name))
-            else:
-                ic_dict[ic_data.name] = ic_data
+    for ic_data in iter_ic_list(ic_list, variables=variables, v_ref=v_ref, n_workers=n_workers, cache_dir=cache_dir,
+                                lazy=lazy, backend=backend, inexisting_ic_list=inexisting_ic_list, timer=timer,
+                                duplicates=duplicates):
+        ic_dict[ic_data.name] = ic_data
 
     logging.info("Import ice core lists completed")
     if inexisting_ic_list.__len__()>0:
         logger.info("%s core does not exits. Removing from collection" % ', '.join(inexisting_ic_list))
 
-    for ic in inexisting_ic_list:
-        for ic2 in ic_dict.keys():
-            if ic in ic_dict[ic2].collection:
-                ic_dict[ic2].del_from_collection(ic)
-                logger.info("remove %s from %s collection" % (ic, ic2))
+    prune_collections(ic_dict, inexisting_ic_list)
     return ic_dict
 
 
-def import_ic_sourcefile(f_path, variables=None, ic_dir=None, v_ref='top'):
+def iter_ic_list(ic_list, variables=None, v_ref='top', n_workers=1, cache_dir=None, lazy=False, backend='openpyxl',
+                 inexisting_ic_list=None, timer=None, duplicates=None):
+    """
+    Import the cores one at a time. Contrary to import_ic_list, a core is not kept once yielded, and cores missing from
+    the list are not removed from the collection of the yielded cores.
+
+    :param ic_list:
+            array, array contains absolute filepath for the cores
+    :param variables:
+    :param v_ref:
+        top, or bottom
+    :param n_workers:
+        int or None, default 1. Number of worker processes used to import the cores. If None, use all available cpu.
+    :param cache_dir:
+        string, default None. Path to the cache directory of parsed cores.
+    :param lazy:
+        boolean, default False. If True, variable sheets are read on demand.
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader, see import_ic_path
+    :param inexisting_ic_list:
+        list, default None. If defined, the names of the cores without file or without profile are appended to it, to
+        remove them from the collections once all the cores are imported.
+    :param timer:
+        ImportTimer, default None. If defined, the import stages of each file are recorded in timer
+    :param duplicates:
+        'first', 'last', 'newest', 'skip' or None, default None. Policy for duplicated files, see import_ic_list
+    :return:
+        generator of seaice.Core, in the order of ic_list
+    """
+    logger = logging.getLogger(__name__)
+
+    if inexisting_ic_list is None:
+        inexisting_ic_list = []
+
+    if duplicates is not None:
+        ic_list, report = dedup_ic_list(ic_list, policy=duplicates)
+        # cores whose files are all skipped
+        skipped = set(report.name) - set(report.loc[report.status == 'kept', 'name'])
+        inexisting_ic_list.extend(sorted(skipped))
+
+    ic_paths = []
+    for ic_path in ic_list:
+        if not os.path.exists(ic_path):
+            logger.warning("%s does not exists in core directory" % ic_path.split('/')[-1])
+            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+        else:
+            ic_paths.append(ic_path)
+
+    for ic_path, ic_data in zip(ic_paths, _map_ic_path(ic_paths, n_workers=n_workers, variables=variables,
+                                                      v_ref=v_ref, cache_dir=cache_dir, lazy=lazy,
+                                                      backend=backend, timer=timer)):
+        if not ic_data.pending_sheets() and ic_data.variables().size == 0:
+            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+            logger.warning("%s have no properties profile" % (ic_data.name))
+        else:
+            yield ic_data
+
+
+def import_ic_sourcefile(f_path, variables=None, ic_dir=None, v_ref='top', n_workers=1, cache_dir=None, lazy=False,
+                         backend='openpyxl', duplicates=None):
     """
     :param filepath:
             string, absolute path to the file containing either the absolute path of the cores (1 path by line) or the
@@ -285,24 +527,128 @@ def import_ic_sourcefile(f_path, variables=None, ic_dir=None, v_ref='top'):
 
     :param v_ref:
         top, or bottom
+    :param n_workers:
+        int or None, default 1. Number of worker processes used to import the cores. If None, use all available cpu.
+    :param cache_dir:
+        string, default None. Path to the cache directory of parsed cores.
+    :param lazy:
+        boolean, default False. If True, variable sheets are read on demand.
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader, see import_ic_path
+    :param duplicates:
+        'first', 'last', 'newest', 'skip' or None, default None. Policy for duplicated files, e.g. backup copies
+        listed by make_ic_sourcefile, see import_ic_list
+    """
+    logger = logging.getLogger(__name__)
+    logger.info('Import ice core from source file: %s' % f_path)
+
+    ics = read_ic_sourcefile(f_path, ic_dir=ic_dir)
+
+    print(ics)
+
+    return import_ic_list(ics, variables=variables, v_ref=v_ref, n_workers=n_workers, cache_dir=cache_dir,
+                          lazy=lazy, backend=backend, duplicates=duplicates)
+
+
+def iter_ic_sourcefile(f_path, variables=None, ic_dir=None, v_ref='top', n_workers=1, cache_dir=None, lazy=False,
+                       backend='openpyxl', inexisting_ic_list=None, duplicates=None):
+    """
+    Import the cores listed in a source file one at a time, see iter_ic_list
+
+    :param f_path:
+            string, absolute path to the file containing either the absolute path of the cores (1 path by line) or the
+            core names (1 core by line).
+    :param ic_dir:
+        string, default None. Directory containing the cores, if the source file contains core names.
+    :return:
+        generator of seaice.Core
     """
     logger = logging.getLogger(__name__)
     logger.info('Import ice core from source file: %s' % f_path)
 
+    ics = read_ic_sourcefile(f_path, ic_dir=ic_dir)
+    return iter_ic_list(ics, variables=variables, v_ref=v_ref, n_workers=n_workers, cache_dir=cache_dir, lazy=lazy,
+                        backend=backend, inexisting_ic_list=inexisting_ic_list, duplicates=duplicates)
+
+
+def read_ic_sourcefile(f_path, ic_dir=None):
+    """
+    :param f_path:
+        string, absolute path to the source file
+    :param ic_dir:
+        string, default None. If defined, the lines of the source file are joined to ic_dir
+    :return:
+        list of string, sorted path of the cores
+    """
     if ic_dir is not None:
         with open(f_path) as f:
             ics = sorted([os.path.join(ic_dir, line.strip()) for line in f if not line.strip().startswith('#')])
     else:
         with open(f_path) as f:
             ics = sorted([line.strip() for line in f if not line.strip().startswith('#')])
+    return ics
 
-    print(ics)
 
-    return import_ic_list(ics, variables=variables, v_ref=v_ref)
+def _map_ic_path(ic_paths, n_workers=1, **kwargs):
+    """
+    Import ice core files, sequentially or with a pool of worker processes, and yield the cores in the order of ic_paths
+
+    :param ic_paths:
+        list of string, path to the xlsx ice core spreadsheets. All paths should exist.
+    :param n_workers:
+        int or None, default 1. Number of worker processes. If None, use all available cpu.
+    :param kwargs:
+        keyword arguments passed to import_ic_path
+    :return:
+        generator of seaice.Core
+    """
+    logger = logging.getLogger(__name__)
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = min(n_workers, ic_paths.__len__())
+
+    if n_workers <= 1:
+        for ic_path in ic_paths:
+            yield import_ic_path(ic_path, **kwargs)
+    else:
+        logger.info("Importing %i ice cores with %i worker processes" % (ic_paths.__len__(), n_workers))
+        # each worker records in its own timer; the records are sent back with the core
+        timer = kwargs.pop('timer', None)
+        if timer is not None:
+            kwargs['timer'] = ImportTimer()
+        args = [(ic_path, kwargs) for ic_path in ic_paths]
+        with multiprocessing.Pool(n_workers) as pool:
+            # imap keeps the order of ic_paths
+            for ic_data, records in pool.imap(_import_ic_path_worker, args):
+                if timer is not None:
+                    timer.extend(records)
+                yield ic_data
+
+
+def _import_ic_path_worker(args):
+    """
+    Unpack import_ic_path arguments in a worker process
+
+    :param args:
+        tuple (ic_path, kwargs)
+    :return:
+        tuple (seaice.Core, list of the timing records of the core)
+    """
+    ic_path, kwargs = args
+    timer = kwargs.get('timer')
+    if timer is not None:
+        del timer.records[:]
+    ic_data = import_ic_path(ic_path, **kwargs)
+    return ic_data, (timer.records if timer is not None else [])
+
+
+# __name__ is overwritten at the top of the module; point pickle to the importable module name for the process pool
+_import_ic_path_worker.__module__ = 'seaice.core'
 
 
 # read variable
-def read_variable(ws_variable, variables=None, version=__CoreVersion__, v_ref='top'):
+def read_variable(ws_variable, variables=None, version=__CoreVersion__, v_ref='top', timer=NULL_TIMER):
     """
     :param ws_variable:
         openpyxl.worksheet
@@ -310,59 +656,58 @@ def read_variable(ws_variable, variables=None, version=__CoreVersion__, v_ref='t
     :param version:
     :param v_ref:
         top, or bottom
+    :param timer:
+        ImportTimer, default NULL_TIMER. Timer recording the to_numeric stage
     """
     logger = logging.getLogger(__name__)
 
-    if version == 1:
-        row_data_start = 6
-    elif version == 1.1:
-        row_data_start = 8
-        if ws_variable['C4'].value:
-            v_ref = ws_variable['C4'].value
-    else:
+    plan = get_plan(version)
+    if plan is None:
         logger.error("ice core spreadsheet version not defined")
         return None
 
-    variable_2_data = {'temperature': [row_data_start, 'A', 'B', 'C'],
-                       'salinity': [row_data_start, 'ABC', 'D', 'J'],
-                       'conductivity': [row_data_start, 'ABC', 'EF', 'J'],
-                       'specific conductance': [row_data_start, 'ABC', 'G', 'J'],
-                       'd18O': [row_data_start, 'ABC', 'H', 'J'],
-                       'dD': [row_data_start, 'ABC', 'I', 'J'],
-                       'oil weight fraction': [row_data_start, 'ABC', 'G', 'H'],
-                       'oil volume fraction': [row_data_start, 'ABC', 'F', 'H'],
-                       'oil content': [row_data_start, 'ABC', 'DEFGH', 'I'],
-                       'oil mass': [row_data_start, 'ABC', 'ED', 'H']
-                       # 'seawater': [row_data_start, 'ABC', 'D', 'E'],
-                       # 'sediment': [row_data_start, 'ABC', 'D', 'E'],
-                       # 'Chla': [row_data_start, 'ABC', 'D', 'E'],
-                       # 'Phae': [row_data_start, 'ABC', 'D', 'E']
-                       }
-
     if variables is None:
-        variables = [key for key in variable_2_data.keys() if variable_2_sheet[key] == ws_variable.title]
+        variables = list(plan.sheets.get(ws_variable.title, ()))
     if not isinstance(variables, list):
         variables = [variables]
+    variable_plans = []
+    for variable in variables:
+        if variable in plan.variables:
+            variable_plans.append(plan.variables[variable])
+        else:
+            logger.error("\t(%s) no extraction plan defined for %s" % (ws_variable.title, variable))
+
+    # read the header and the data block of the sheet in one pass
+    max_col = max([3] + [variable_plan.max_col for variable_plan in variable_plans])
+    block = read_block(ws_variable, max_col=max_col)
+    header = block[:plan.row_data_start - 1]
+    data_block = block[plan.row_data_start - 1:]
+
+    def cell_value(key):
+        if plan.header_cells[key] is None:
+            return None
+        row, col = plan.header_cells[key]
+        if row >= header.shape[0]:
+            return None
+        return header[row, col]
 
-    name = ws_variable['C1'].value
+    if cell_value('v_ref'):
+        v_ref = cell_value('v_ref')
+
+    name = cell_value('name')
 
     profile = {}
-    for variable in variables:
-        columns_string = ['comment', 'variable']
+    for variable_plan in variable_plans:
+        variable = variable_plan.variable
+        columns_float = list(variable_plan.depth_names)
+        data = [data_block[:, col] for col in variable_plan.depth_columns]
         # step profile
-        if variable_2_data[variable][1].__len__() == 3:
-            columns_float = ['y_low', 'y_sup', 'y_mid']
-            y_low = np.array([ws_variable[variable_2_data[variable][1][0]+str(row)].value
-                              for row in range(variable_2_data[variable][0], ws_variable.max_row+1)])
-            y_sup = np.array([ws_variable[variable_2_data[variable][1][1]+str(row)].value
-                              for row in range(variable_2_data[variable][0], ws_variable.max_row+1)])
-            y_mid = np.array([ws_variable[variable_2_data[variable][1][2] + str(row)].value
-                              for row in range(variable_2_data[variable][0], ws_variable.max_row+1)])
-
+        if variable_plan.kind == 'step':
+            y_low, y_sup, y_mid = data
             if not np.array([isinstance(element, (float, int)) for element in y_mid]).any():
                 if (np.array([isinstance(element, (float, int)) for element in y_low]).any() or
                         np.array([isinstance(element, (float, int)) for element in y_sup]).any()):
-                    y_mid = (y_low+y_sup)/2
+                    data[2] = (y_low+y_sup)/2
                     logger.info(
                         '\t(%s : %s) y_mid does not exit, calculating y_mid from section depth with success'
                         % (name, variable))
@@ -370,91 +715,42 @@ def read_variable(ws_variable, variables=None, version=__CoreVersion__, v_ref='t
                     logger.warning(
                         '\t(%s : %s) y_mid does not exit, not able to calculate y_mid from section depth. Section'
                         'depth maybe not numeric' % (name, variable))
-            data = np.array([y_low, y_sup, y_mid])
-
-            for col_variable in range(0, variable_2_data[variable][2].__len__()):
-                data = np.vstack((data, np.array([ws_variable[variable_2_data[variable][2][col_variable] +
-                                                              str(row)].value
-                                                  for row in range(variable_2_data[variable][0],
-                                                                   ws_variable.max_row+1)])))
-                if version is 1:
-                    if col_variable is 0:
-                        columns_float.append(variable)
-                    else:
-                        columns_float.append(
-                            ws_variable[variable_2_data[variable][2][col_variable] + str(row_data_start - 3)].value)
-
-                elif version >= 1.1:
-                    columns_float.append(ws_variable[variable_2_data[variable][2][col_variable] +
-                                                     str(row_data_start-3)].value)
-
-            data = np.vstack((data, np.array([ws_variable[variable_2_data[variable][3] + str(row)].value
-                                              for row in range(variable_2_data[variable][0], ws_variable.max_row+1)])))
-
-            variable_profile = pd.DataFrame(data.transpose(), columns=columns_float + ['comment'])
-
-        # continuous variable_profile
-        else:
-            columns_float = ['y_mid']
-            y_mid = np.array([ws_variable[variable_2_data[variable][1]+str(row)].value
-                              for row in range(variable_2_data[variable][0], ws_variable.max_row+1)])
-
-            for col_variable in range(0, variable_2_data[variable][2].__len__()):
-                data = np.vstack((y_mid, np.array([ws_variable[variable_2_data[variable][2][col_variable] +
-                                                               str(row)].value
-                                                   for row in range(variable_2_data[variable][0],
-                                                                    ws_variable.max_row+1)])))
-                if version is 1:
-                    if col_variable is 0:
-                        columns_float.append(variable)
-                    else:
-                        columns_float.append(
-                            ws_variable[variable_2_data[variable][2][col_variable] + str(row_data_start - 3)].value)
-
-                elif version >= 1.1:
-                    columns_float.append(ws_variable[variable_2_data[variable][2][col_variable] +
-                                                     str(row_data_start-3)].value)
-
-            data = np.vstack((data, np.array([ws_variable[(variable_2_data[variable][3] + str(row))].value
-                                              for row in range(variable_2_data[variable][0], ws_variable.max_row+1)])))
-
-            variable_profile = pd.DataFrame(data.transpose(), columns=columns_float + ['comment'])
+
+        for col, value_name in zip(variable_plan.value_columns, variable_plan.value_names):
+            data.append(data_block[:, col])
+            if value_name is None and plan.header_row < header.shape[0]:
+                value_name = header[plan.header_row, col]
+            columns_float.append(value_name)
 
         # add ice core length
-        try:
-            length = ws_variable['C2'].value
-        except:
+        length = cell_value('length')
+        if length is None:
             logger.info('%s no ice core length' % name)
             length = np.nan
-        else:
-            if length == 'n/a':
-                logger.info('%s ice core length is not available (n/a)' % name)
-                length = np.nan
-            elif not isinstance(length, (int, float)):
-                logger.info('%s ice core length is not a number' % name)
-                length = np.nan
-        variable_profile['length'] = length
+        elif length == 'n/a':
+            logger.info('%s ice core length is not available (n/a)' % name)
+            length = np.nan
+        elif not isinstance(length, (int, float)):
+            logger.info('%s ice core length is not a number' % name)
+            length = np.nan
 
         # convert numeric to float
-        key_temp = [key for key in variable_profile.keys() if key not in ['comment']]
-        for key in key_temp:
-            variable_profile[key] = pd.to_numeric(variable_profile[key], errors='coerce')
-
-        # add ice core note
-        try:
-            note = ws_variable['C3'].value
-        except:
-            logger.debug('%s no ice core note' % name)
-            note = None
-        variable_profile['note'] = note
-
-        # set vertical references
-        variable_profile['v_ref'] = v_ref
-
-        # set variable
-        variable_profile['variable'] = variable
-
-        variable_profile['name'] = name
+        n_rows = data_block.shape[0]
+        with timer.stage('to_numeric', ws_variable.title) as record:
+            columns = [to_float(values, variable_plan.dtype) for values in data]
+            record.rows = n_rows
+        columns.append(data_block[:, variable_plan.comment_column].astype(object))
+        columns.append(np.full(n_rows, length, dtype=variable_plan.dtype))
+
+        # add ice core note, vertical reference, variable and core name, as categorical
+        note = cell_value('note')
+        columns.append(constant_categorical(note, n_rows, 'note'))
+        columns.append(constant_categorical(v_ref, n_rows, 'v_ref'))
+        columns.append(constant_categorical(variable, n_rows, 'variable'))
+        columns.append(constant_categorical(name, n_rows, 'name'))
+        # column names may repeat, the frame is built by position
+        variable_profile = pd.DataFrame(dict(enumerate(columns)))
+        variable_profile.columns = columns_float + ['comment', 'length', 'note', 'v_ref', 'variable', 'name']
 
         if variable_profile[variable].notna().any():
             profile[variable] = [variable_profile, name, note, length]
@@ -565,6 +861,26 @@ def update_spreadsheet(ic_path, v_ref='top', backup=True):
             os.makedirs(backup_dir)
         shutil.copyfile(ic_path, os.path.join(backup_dir, os.path.basename(ic_path)))
 
+    upgrade_workbook(wb, v_ref=v_ref)
+    wb.save(ic_path)
+
+
+def upgrade_workbook(wb, v_ref='top'):
+    """
+    Apply the version updates to the sheets of an ice core spreadsheet, up to the latest version (__CoreVersion__)
+
+    :param wb:
+        openpyxl.workbook or MemoryWorkbook, ice core spreadsheet. The sheets are modified in place
+    :param v_ref: 'top' or 'bottom'
+        vertical reference written in the variable sheets
+    :return version:
+        float, spreadsheet version after the update
+    """
+    logger = logging.getLogger(__name__)
+
+    ws_summary = wb['summary']
+    version = ws_summary['C3'].value
+
     while version < __CoreVersion__:
         # update from 1.0 to 1.1
         if version == 1:
@@ -625,47 +941,62 @@ def update_spreadsheet(ic_path, v_ref='top', backup=True):
                 ws['E6'] = 'h_menisc'
                 ws['F6'] = 'd_menisc'
                 ws['G6'] = 'd_center'
-        wb.save(ic_path)
+        else:
+            logger.error("no update defined from version %s" % str(version))
+            break
+    return version
 
 
 def add_row(ws, row_number):
     """
+    Insert an empty row, shifting down the rows below
+
     :param ws:
+        openpyxl.worksheet or EditableSheet
     :param row_number:
+        int, index of the inserted row
     :return:
     """
-    max_row = ws.max_row
-    for row in range(row_number, ws.max_row + 1):
-        new_row = row_number + max_row + 1 - row
-        old_row = row_number + max_row - row
-        for col in range(1, ws.max_column+1):
-            ws.cell(row=new_row, column=col).value = ws.cell(row=old_row, column=col).value
-    for col in range(1, ws.max_column+1):
-        ws.cell(row=row_number, column=col).value = ""
+    ws.insert_rows(row_number)
     return ws
 
 
 def delete_row(ws, row_number):
     """
+    Delete a row, shifting up the rows below
 
     :param ws:
+        openpyxl.worksheet or EditableSheet
     :param row_number:
+        int, index of the deleted row
     :return:
     """
-    max_row = ws.max_row
-    for row in range(row_number, max_row):
-        new_row = row
-        old_row = row+1
-        for col in range(1, ws.max_column+1):
-            ws.cell(row=new_row, column=col).value = ws.cell(row=old_row, column=col).value
-    for col in range(1, ws.max_column+1):
-        ws.cell(row=max_row+1, column=col).value = ""
+    ws.delete_rows(row_number)
     return ws
 
 
+def _last_column(ws, start_row):
+    """
+    Last column of the worksheet, ignoring an empty last column from start_row downward
+    """
+    # max_column is computed from all the cells of the worksheet, read it once
+    max_col = ws.max_column
+    if np.alltrue([ws.cell(row=row, column=max_col).value is None for row in range(start_row, ws.max_row)]):
+        max_col = max_col - 1
+    return max_col
+
+
+def _column_range(min_col, max_col, start_row, end_row):
+    return "%s%i:%s%i" % (openpyxl.utils.get_column_letter(min_col), start_row,
+                          openpyxl.utils.get_column_letter(max_col), end_row)
+
+
 def delete_column(ws, target_col, start_row=None, end_row=None):
     """
+    Delete a column between start_row and end_row, shifting left the columns on the right
+
     :param ws:
+        openpyxl.worksheet or EditableSheet
     :param target_col:
     :param start_row:
     :param end_row:
@@ -678,16 +1009,10 @@ def delete_column(ws, target_col, start_row=None, end_row=None):
     if not isinstance(target_col, int):
         target_col = openpyxl.utils.column_index_from_string(target_col)
 
-    max_col = ws.max_column
-    if np.alltrue([ws.cell(row=row, column=ws.max_column).value is None for row in range(start_row, ws.max_row)]):
-        max_col = max_col - 1
+    max_col = _last_column(ws, start_row)
 
-    if not target_col == max_col:
-        for col in range(target_col, max_col):
-            new_col = col
-            old_col = col + 1
-            for row in range(start_row, end_row + 1):
-                ws.cell(row=row, column=new_col).value = ws.cell(row=row, column=old_col).value
+    if target_col < max_col:
+        ws.move_range(_column_range(target_col + 1, max_col, start_row, end_row), cols=-1)
     for row in range(start_row, end_row + 1):
         ws.cell(row=row, column=max_col).value = ""
 
@@ -696,7 +1021,10 @@ def delete_column(ws, target_col, start_row=None, end_row=None):
 
 def move_column(ws, target_col, source_col, start_row=None, end_row=None):
     """
+    Move a column between start_row and end_row: the source column is inserted before the target column
+
     :param ws:
+        openpyxl.worksheet or EditableSheet
     :param target_col:
     :param source_col:
     :param start_row:
@@ -713,23 +1041,16 @@ def move_column(ws, target_col, source_col, start_row=None, end_row=None):
     if not isinstance(source_col, int):
         source_col = openpyxl.utils.column_index_from_string(source_col)
 
-    max_col = ws.max_column
-    if np.alltrue([ws.cell(row=row, column=ws.max_column).value is None for row in range(start_row, ws.max_row)]):
-        max_col = max_col - 1
+    max_col = _last_column(ws, start_row)
 
     # insert column in target column
-    for col in range(target_col, max_col+1):
-        new_col = target_col + max_col - col + 1
-        old_col = target_col + max_col - col
-        # print(openpyxl.utils.get_column_letter(old_col), openpyxl.utils.get_column_letter(new_col))
-        for row in range(start_row, end_row + 1):
-            ws.cell(row=row, column=new_col).value = ws.cell(row=row, column=old_col).value
-
-    # copy source col to target column
+    if target_col <= max_col:
+        ws.move_range(_column_range(target_col, max_col, start_row, end_row), cols=1)
+
+    # move source col to target column
     if target_col < source_col:
         source_col = source_col + 1
-    for row in range(start_row, end_row + 1):
-        ws.cell(row=row, column=target_col).value = ws.cell(row=row, column=source_col).value
+    ws.move_range(_column_range(source_col, source_col, start_row, end_row), cols=target_col - source_col)
 
     ws = delete_column(ws, source_col, start_row, end_row)
 
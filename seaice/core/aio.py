@@ -0,0 +1,115 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.aio.py : asyncio import of ice core spreadsheet, reading the files ahead while parsing
+
+USAGE:
+    ic_dict = asyncio.run(seaice.core.aio.import_ic_list_async(ic_paths, concurrency=8))
+
+"""
+import asyncio
+import concurrent.futures
+import logging
+
+import seaice
+from seaice.core.collection import prune_collections
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to import ice core with asyncio, overlapping file reading and parsing"
+__CoreVersion__ = 1.1
+
+__all__ = ["import_ic_list_async"]
+
+
+def _read_file(ic_path):
+    """
+    :return:
+        bytes, content of the file, or None if the file does not exist
+    """
+    try:
+        with open(ic_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _import_ic_source_worker(args):
+    """
+    Import an ice core from the content of its file, in an executor
+
+    :param args:
+        tuple (ic_path, source, kwargs)
+    :return:
+        seaice.Core
+    """
+    ic_path, source, kwargs = args
+    return seaice.core.import_ic_path(ic_path, source=source, **kwargs)
+
+async def import_ic_list_async(ic_list, variables=None, v_ref='top', concurrency=4, executor=None, cache_dir=None,
+                               lazy=False, backend='openpyxl'):
+    """
+    Import a list of ice core. Up to concurrency files are read ahead in threads while the files already read are
+    parsed in executor, so that the file access latency, e.g. of a network mount, overlaps with the parsing.
+
+    :param ic_list:
+        array, absolute filepath of the cores
+    :param variables:
+        list of string, variables to import. If not defined, all variable will be imported.
+    :param v_ref:
+        'top' or 'bottom', vertical reference
+    :param concurrency:
+        int, default 4. Maximal number of files read or parsed at once; bounds the memory held by files read ahead.
+    :param executor:
+        concurrent.futures.Executor, default None. Executor parsing the files. If None, the default executor of the
+        event loop (threads) is used; use a ProcessPoolExecutor to parse several files in parallel.
+    :param cache_dir:
+        string, default None. Path to the cache directory of parsed cores, see import_ic_list
+    :param lazy:
+        boolean, default False. If True, variable sheets are read on demand, see import_ic_list
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader, see import_ic_path
+    :return:
+        dict, core name: seaice.Core, as returned by import_ic_list
+    """
+    logger = logging.getLogger(__name__)
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    kwargs = {'variables': variables, 'v_ref': v_ref, 'cache_dir': cache_dir, 'lazy': lazy, 'backend': backend}
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as io_executor:
+        async def _import(ic_path):
+            # the file content is released once parsed, before the next file is read
+            async with semaphore:
+                source = await loop.run_in_executor(io_executor, _read_file, ic_path)
+                if source is None:
+                    return None
+                return await loop.run_in_executor(executor, _import_ic_source_worker, (ic_path, source, kwargs))
+
+        ic_list = list(ic_list)
+        ic_datas = await asyncio.gather(*[_import(ic_path) for ic_path in ic_list])
+
+    ic_dict = {}
+    inexisting_ic_list = []
+    for ic_path, ic_data in zip(ic_list, ic_datas):
+        if ic_data is None:
+            logger.warning("%s does not exists in core directory" % ic_path.split('/')[-1])
+            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+        elif not ic_data.pending_sheets() and ic_data.variables().size == 0:
+            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+            logger.warning("%s have no properties profile" % ic_data.name)
+        else:
+            ic_dict[ic_data.name] = ic_data
+
+    logger.info("Import ice core lists completed")
+    if inexisting_ic_list.__len__() > 0:
+        logger.info("%s core does not exits. Removing from collection" % ', '.join(inexisting_ic_list))
+    prune_collections(ic_dict, inexisting_ic_list)
+    return ic_dict
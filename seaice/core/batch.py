@@ -0,0 +1,175 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.batch.py : resumable batch import of ice core spreadsheet, with checkpoints and error ledger
+
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+
+import pandas as pd
+import seaice
+from seaice.core.cache import cache_key, file_hash
+from seaice.core.collection import prune_collections
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to import large set of ice core, resuming interrupted imports"
+__CoreVersion__ = 1.1
+
+__all__ = ["import_ic_batch", "read_ledger"]
+
+LEDGER_FILE = 'ledger.jsonl'
+CORE_DIR = 'cores'
+LEDGER_COLUMNS = ['path', 'status', 'name', 'key', 'time', 'date', 'error', 'traceback']
+
+
+def read_ledger(checkpoint_dir):
+    """
+    :param checkpoint_dir:
+        string, checkpoint directory of import_ic_batch
+    :return:
+        pd.DataFrame, last ledger record of each file: path, status ('ok', 'empty' or 'error'), core name, cache key,
+        import time (s), date of the record, error message and traceback
+    """
+    logger = logging.getLogger(__name__)
+
+    records = {}
+    ledger_path = os.path.join(checkpoint_dir, LEDGER_FILE)
+    if os.path.exists(ledger_path):
+        with open(ledger_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line of a ledger interrupted while writing
+                    logger.warning("skipping corrupted ledger line in %s" % ledger_path)
+                    continue
+                records[record['path']] = record
+    return pd.DataFrame(list(records.values()), columns=LEDGER_COLUMNS)
+
+
+def _import_ic_batch_worker(args):
+    """
+    Import an ice core spreadsheet, catching any error
+
+    :param args:
+        tuple (ic_path, key, kwargs)
+    :return:
+        tuple (ic_path, key, seaice.Core or None, traceback or None, time)
+    """
+    ic_path, key, kwargs = args
+    t_start = time.perf_counter()
+    try:
+        ic_data = seaice.core.import_ic_path(ic_path, **kwargs)
+        return ic_path, key, ic_data, None, time.perf_counter() - t_start
+    except Exception:
+        return ic_path, key, None, traceback.format_exc(), time.perf_counter() - t_start
+
+
+def import_ic_batch(ic_list, checkpoint_dir, variables=None, v_ref='top', n_workers=1, backend='openpyxl',
+                    retry_failed=False):
+    """
+    Import a list of ice core, isolating each file. Imported cores are checkpointed in checkpoint_dir and every file is
+    recorded in a ledger, with the traceback of the failures. Running the import again resumes from the checkpoint:
+    imported cores are loaded from the checkpoint, unchanged files which failed are skipped, and only the other files
+    are imported.
+
+    :param ic_list:
+        array, absolute filepath of the cores
+    :param checkpoint_dir:
+        string, directory holding the ledger and the checkpointed cores
+    :param variables:
+        list of string, variables to import. If not defined, all variable will be imported.
+    :param v_ref:
+        'top' or 'bottom', vertical reference
+    :param n_workers:
+        int or None, default 1. Number of worker processes. If None, use all available cpu.
+    :param backend:
+        'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader, see import_ic_path
+    :param retry_failed:
+        boolean, default False. If True, files which failed in a previous run are imported again even if unchanged
+    :return:
+        dict, core name: seaice.Core. As for import_ic_list, cores missing, failed or without profile are removed from
+        the collections.
+    """
+    logger = logging.getLogger(__name__)
+
+    if not os.path.exists(checkpoint_dir):
+        os.makedirs(checkpoint_dir)
+    cache_dir = os.path.join(checkpoint_dir, CORE_DIR)
+    ledger = read_ledger(checkpoint_dir).set_index('path')
+
+    inexisting_ic_list = []
+    args = []
+    n_skipped = 0
+    for ic_path in ic_list:
+        if not os.path.exists(ic_path):
+            logger.warning("%s does not exists in core directory" % ic_path.split('/')[-1])
+            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+            continue
+        # the hash is passed to the import, so that each file is read only once to build its cache key
+        f_hash = file_hash(ic_path)
+        key = cache_key(ic_path, variables=variables, v_ref=v_ref, f_hash=f_hash)
+        if (not retry_failed and ic_path in ledger.index and ledger.loc[ic_path, 'status'] == 'error' and
+                ledger.loc[ic_path, 'key'] == key):
+            logger.info("%s failed in a previous run and is unchanged, skipping it" % ic_path.split('/')[-1])
+            inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+            n_skipped += 1
+            continue
+        args.append((ic_path, key, {'variables': variables, 'v_ref': v_ref, 'cache_dir': cache_dir,
+                                    'backend': backend, 'f_hash': f_hash}))
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, args.__len__()))
+
+    ic_dict = {}
+    n_error = 0
+    with open(os.path.join(checkpoint_dir, LEDGER_FILE), 'a') as f_ledger:
+        if n_workers <= 1:
+            results = map(_import_ic_batch_worker, args)
+        else:
+            pool = multiprocessing.Pool(n_workers)
+            results = pool.imap(_import_ic_batch_worker, args)
+        try:
+            for ic_path, key, ic_data, error, t_import in results:
+                record = {'path': ic_path, 'status': 'ok', 'name': None, 'key': key, 'time': t_import,
+                          'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'error': None, 'traceback': None}
+                if error is not None:
+                    record['status'] = 'error'
+                    record['error'] = error.strip().split('\n')[-1]
+                    record['traceback'] = error
+                    inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+                    logger.error("%s could not be imported (%s)" % (ic_path.split('/')[-1], record['error']))
+                    n_error += 1
+                else:
+                    record['name'] = ic_data.name
+                    if ic_data.variables().size == 0:
+                        record['status'] = 'empty'
+                        inexisting_ic_list.append(ic_path.split('/')[-1].split('.')[0])
+                        logger.warning("%s have no properties profile" % ic_data.name)
+                    else:
+                        ic_dict[ic_data.name] = ic_data
+                # the ledger is flushed after each file, so that an interrupted run can be resumed
+                f_ledger.write(json.dumps(record) + '\n')
+                f_ledger.flush()
+        finally:
+            if n_workers > 1:
+                pool.terminate()
+
+    logger.info("Batch import: %i cores imported, %i failed, %i skipped as failed in a previous run"
+                % (ic_dict.__len__(), n_error, n_skipped))
+
+    prune_collections(ic_dict, inexisting_ic_list)
+    return ic_dict
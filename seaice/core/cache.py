@@ -0,0 +1,182 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.cache.py : on-disk cache of ice core imported from xlsx spreadsheet
+
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import seaice
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to store and load parsed ice core"
+__CoreVersion__ = 1.1
+
+__all__ = ["cache_key", "file_hash", "load_core", "save_core", "core_to_arrays", "core_from_arrays"]
+
+# format of the cache entries, part of the cache key: entries of a previous format are not read
+CACHE_FORMAT = 2
+
+# Core attributes stored in the cache entry, beside the profile
+CORE_ATTRIBUTES = ['name', 'date', 'origin', 'lat', 'lon', 'ice_thickness', 'freeboard', 'snow_depth', 'collection',
+                   'comment', 't_air', 't_snow_surface', 't_ice_surface', 't_water', 'protocol']
+
+
+def file_hash(ic_path, blocksize=2**20):
+    """
+    :param ic_path:
+        string, path to the file
+    :param blocksize:
+        int, size of the chunk read at once
+    :return:
+        string, sha1 hexdigest of the file content
+    """
+    h = hashlib.sha1()
+    with open(ic_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(blocksize), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(ic_path, variables=None, v_ref='top', f_hash=None):
+    """
+    Cache key of an ice core file, computed from the file content, the spreadsheet version handled by the module, the
+    format of the cache entries, the vertical reference and the requested variables.
+
+    :param ic_path:
+        string, path to the xlsx ice core spreadsheet
+    :param variables:
+        list of string, variables to import
+    :param v_ref:
+        'top' or 'bottom', vertical reference
+    :param f_hash:
+        string, hash of the file content. If None, the hash is computed from ic_path
+    :return:
+        string, sha1 hexdigest
+    """
+    if f_hash is None:
+        f_hash = file_hash(ic_path)
+    if variables is not None and not isinstance(variables, list):
+        variables = [variables]
+    h = hashlib.sha1(f_hash.encode())
+    h.update(repr((__CoreVersion__, CACHE_FORMAT, v_ref, variables)).encode())
+    return h.hexdigest()
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + '.npz')
+
+
+def core_to_arrays(core):
+    """
+    Split a core into a dictionary of arrays: one array per profile column and the core attributes
+
+    :param core:
+        seaice.Core
+    :return:
+        dict of np.array
+    """
+    profile = core.profile
+    arrays = {'__columns__': np.array(profile.columns.tolist(), dtype=str),
+              '__core__': np.array({attr: getattr(core, attr) for attr in CORE_ATTRIBUTES}, dtype=object)}
+    for ii_col, column in enumerate(profile.columns):
+        values = profile.iloc[:, ii_col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # categorical columns are stored as codes and categories
+            arrays['col_%i' % ii_col] = values.cat.codes.values
+            arrays['cat_%i' % ii_col] = np.array(values.cat.categories.tolist() + [None], dtype=object)[:-1]
+            continue
+        values = values.values
+        if values.dtype.kind not in 'biufcM':
+            values = values.astype(object)
+        arrays['col_%i' % ii_col] = values
+    return arrays
+
+
+def core_from_arrays(arrays):
+    """
+    Rebuild a core from the arrays produced by core_to_arrays
+
+    :param arrays:
+        dict-like of np.array
+    :return:
+        seaice.Core
+    """
+    attrs = arrays['__core__'].item()
+    columns = arrays['__columns__'].tolist()
+    values = []
+    for ii_col in range(columns.__len__()):
+        if 'cat_%i' % ii_col in arrays:
+            values.append(pd.Categorical.from_codes(arrays['col_%i' % ii_col],
+                                                    categories=pd.Index(arrays['cat_%i' % ii_col])))
+        else:
+            values.append(arrays['col_%i' % ii_col])
+    profile = pd.DataFrame(dict(enumerate(values)))
+    profile.columns = columns
+
+    core = seaice.Core(attrs['name'], attrs['date'], attrs['origin'], attrs['lat'], attrs['lon'],
+                       attrs['ice_thickness'], attrs['freeboard'], attrs['snow_depth'])
+    for attr in CORE_ATTRIBUTES[8:]:
+        setattr(core, attr, attrs[attr])
+    if not profile.empty:
+        core.add_profile(profile)
+    return core
+
+
+def load_core(cache_dir, key):
+    """
+    :param cache_dir:
+        string, path to the cache directory
+    :param key:
+        string, cache key
+    :return:
+        seaice.Core, or None if the key is not in the cache
+    """
+    logger = logging.getLogger(__name__)
+
+    entry_path = _entry_path(cache_dir, key)
+    if not os.path.exists(entry_path):
+        return None
+    try:
+        with np.load(entry_path, allow_pickle=True) as arrays:
+            core = core_from_arrays(arrays)
+    except Exception:
+        logger.warning("cache entry %s is corrupted, ignoring it" % entry_path)
+        return None
+    logger.debug("(%s) loaded from cache" % core.name)
+    return core
+
+
+def save_core(cache_dir, key, core):
+    """
+    :param cache_dir:
+        string, path to the cache directory
+    :param key:
+        string, cache key
+    :param core:
+        seaice.Core
+    :return:
+        string, path to the cache entry
+    """
+    entry_path = _entry_path(cache_dir, key)
+    if not os.path.exists(os.path.dirname(entry_path)):
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+    # write to a temporary file first, so that concurrent readers never see a partial entry
+    fd, temp_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(entry_path))
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, **core_to_arrays(core))
+    os.replace(temp_path, entry_path)
+    return entry_path
@@ -0,0 +1,293 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.catalog.py : persistent SQLite catalog of ice core metadata
+
+"""
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+import seaice
+from seaice.core.scan import scan_ic_list
+from seaice.core.sync import scan_changes
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "classes to store and query ice core metadata in a SQLite database"
+__CoreVersion__ = 1.1
+
+__all__ = ["CoreCatalog"]
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cores (
+    path TEXT PRIMARY KEY,
+    hash TEXT,
+    mtime REAL,
+    size INTEGER,
+    name TEXT,
+    date TEXT,
+    timezone TEXT,
+    origin TEXT,
+    lat REAL,
+    lon REAL,
+    ice_thickness REAL,
+    snow_depth REAL,
+    freeboard REAL,
+    collection TEXT
+);
+CREATE TABLE IF NOT EXISTS variables (
+    path TEXT REFERENCES cores(path) ON DELETE CASCADE,
+    variable TEXT,
+    PRIMARY KEY (path, variable)
+);
+CREATE INDEX IF NOT EXISTS cores_name ON cores(name);
+CREATE INDEX IF NOT EXISTS cores_date ON cores(date);
+CREATE INDEX IF NOT EXISTS cores_origin ON cores(origin);
+CREATE INDEX IF NOT EXISTS cores_position ON cores(lat, lon);
+CREATE INDEX IF NOT EXISTS variables_variable ON variables(variable);
+"""
+
+CATALOG_COLUMNS = ['path', 'hash', 'mtime', 'size', 'name', 'date', 'timezone', 'origin', 'lat', 'lon',
+                   'ice_thickness', 'snow_depth', 'freeboard', 'collection']
+
+
+def _float(value):
+    """
+    Summary values may be text in the spreadsheet; store them as NULL instead of failing
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value != value:
+        return None
+    return value
+
+
+class CoreCatalog:
+    """
+    CoreCatalog, SQLite database of the ice core metadata (summary sheet and available variables) used to select the
+    ice core files to import without opening the spreadsheets. The metadata is read by seaice.core.scan, without
+    parsing the profiles: the available variables are the variables holding at least one value.
+
+    USAGE:
+        catalog = CoreCatalog('cores.sqlite')
+        catalog.refresh_dir(ic_dir)
+        ic_paths = catalog.select_paths(variable='salinity', origin='Elson Lagoon', months=[3], ice_thickness=(1, None))
+        ic_dict = seaice.core.import_ic_list(ic_paths)
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path:
+            string, path to the SQLite database. Created if it does not exist.
+        """
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(CATALOG_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def state(self):
+        """
+        :return:
+            dict, ice core file path: {'mtime', 'size', 'hash', 'name'}, as used by seaice.core.sync.scan_changes
+        """
+        cursor = self.conn.execute("SELECT path, mtime, size, hash, name FROM cores")
+        return {path: {'mtime': mtime, 'size': size, 'hash': f_hash, 'name': name}
+                for path, mtime, size, f_hash, name in cursor}
+
+    def refresh(self, ic_list, n_workers=1, backend='openpyxl', prune=None):
+        """
+        Add or update the catalog entries of the ice core files. Only the files added or modified since the previous
+        refresh are read.
+
+        :param ic_list:
+            array, absolute filepath of the cores
+        :param n_workers:
+            int or None, default 1. Number of worker processes used to scan the spreadsheets. If None, use all cpu.
+        :param backend:
+            'openpyxl' or 'xml', default 'openpyxl'. Spreadsheet reader, see scan_ic_path
+        :param prune:
+            string, default None. If defined, the entries of files located in this directory and missing from
+            ic_list are deleted from the catalog.
+        :return:
+            dict, {'added', 'modified', 'removed', 'unchanged'} list of file path
+        """
+        ic_paths = [ic_path for ic_path in ic_list if os.path.exists(ic_path)]
+        state = self.state()
+        changes = scan_changes(ic_paths, state)
+        if prune is not None:
+            prune = os.path.join(os.path.realpath(prune), '')
+            changes['removed'] = [ic_path for ic_path in changes['removed'] if ic_path.startswith(prune)]
+        else:
+            changes['removed'] = []
+
+        # entries of files whose content did not change only need the new modification time
+        for ic_path in changes['unchanged']:
+            entry = changes['files'][ic_path]
+            if entry is not state[ic_path]:
+                self.conn.execute("UPDATE cores SET mtime = ?, size = ? WHERE path = ?",
+                                  (entry['mtime'], entry['size'], ic_path))
+
+        # summary sheet and variables holding data only, the profiles are not parsed
+        updated = changes['added'] + changes['modified']
+        if updated:
+            for row in scan_ic_list(updated, n_workers=n_workers, backend=backend, variables=True).to_dict('records'):
+                self._insert(row['path'], changes['files'][row['path']], row)
+
+        for ic_path in changes['removed']:
+            self.conn.execute("DELETE FROM cores WHERE path = ?", (ic_path,))
+        self.conn.commit()
+
+        self.logger.info("catalog %s: %i added, %i modified, %i removed, %i unchanged files"
+                         % (self.db_path, changes['added'].__len__(), changes['modified'].__len__(),
+                            changes['removed'].__len__(), changes['unchanged'].__len__()))
+        return {key: changes[key] for key in ['added', 'modified', 'removed', 'unchanged']}
+
+    def refresh_dir(self, dirpath, fileext='.xlsx', n_workers=1, backend='openpyxl'):
+        """
+        Synchronise the catalog with the ice core files of a directory, see refresh. Entries of files removed from the
+        directory are deleted.
+
+        :param dirpath:
+            string, directory containing the ice core files
+        :param fileext:
+            string, default '.xlsx'. Extension of the ice core files
+        """
+        return self.refresh(sorted(seaice.core.list_ic_path(dirpath, fileext)), n_workers=n_workers,
+                            backend=backend, prune=dirpath)
+
+    def _insert(self, ic_path, entry, row):
+        """
+        :param ic_path:
+            string, path of the ice core file
+        :param entry:
+            dict, {'mtime', 'size', 'hash'} of the file
+        :param row:
+            dict, metadata of the core returned by seaice.core.scan
+        """
+        if not pd.isnull(row['date']):
+            date = row['date'].replace(tzinfo=None).isoformat(sep=' ')
+            timezone = row['date'].tzname()
+        else:
+            date = None
+            timezone = None
+        values = [ic_path, entry['hash'], entry['mtime'], entry['size'], row['name'], date, timezone, row['origin'],
+                  _float(row['lat']), _float(row['lon']), _float(row['ice_thickness']), _float(row['snow_depth']),
+                  _float(row['freeboard']), row['collection']]
+        self.conn.execute("DELETE FROM cores WHERE path = ?", (ic_path,))
+        self.conn.execute("INSERT INTO cores (%s) VALUES (%s)"
+                          % (', '.join(CATALOG_COLUMNS), ', '.join(['?'] * CATALOG_COLUMNS.__len__())), values)
+        self.conn.executemany("INSERT INTO variables (path, variable) VALUES (?, ?)",
+                              [(ic_path, variable) for variable in row['variables'].split(', ') if variable])
+        entry['name'] = row['name']
+
+    def query(self, variable=None, origin=None, name=None, start=None, end=None, months=None, lat=None, lon=None,
+              ice_thickness=None, snow_depth=None, where=None, params=()):
+        """
+        Select cores from the catalog. Range arguments are tuple (min, max), either bound can be None.
+
+        :param variable:
+            string or list of string, variables the cores must have
+        :param origin:
+            string or list of string
+        :param name:
+            string or list of string
+        :param start:
+            datetime or string 'YYYY-MM-DD', local date of the first core
+        :param end:
+            datetime or string 'YYYY-MM-DD', local date of the last core, inclusive
+        :param months:
+            list of int, months of the year
+        :param lat:
+            tuple, latitude range
+        :param lon:
+            tuple, longitude range
+        :param ice_thickness:
+            tuple, ice thickness range
+        :param snow_depth:
+            tuple, snow depth range
+        :param where:
+            string, additional SQL condition on the cores table
+        :param params:
+            tuple, parameters of the additional condition
+        :return:
+            pd.DataFrame, one row per core with the column of the cores table and the available variables
+        """
+        conditions = []
+        values = []
+
+        def _in(column, value):
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            conditions.append("%s IN (%s)" % (column, ', '.join(['?'] * value.__len__())))
+            values.extend(value)
+
+        def _range(column, value):
+            if value[0] is not None:
+                conditions.append("%s >= ?" % column)
+                values.append(value[0])
+            if value[1] is not None:
+                conditions.append("%s <= ?" % column)
+                values.append(value[1])
+
+        if variable is not None:
+            if not isinstance(variable, list):
+                variable = [variable]
+            for v in variable:
+                conditions.append("path IN (SELECT path FROM variables WHERE variable = ?)")
+                values.append(v)
+        if origin is not None:
+            _in('origin', origin)
+        if name is not None:
+            _in('name', name)
+        if start is not None:
+            conditions.append("date >= ?")
+            values.append(str(start)[:10])
+        if end is not None:
+            conditions.append("date < date(?, '+1 day')")
+            values.append(str(end)[:10])
+        if months is not None:
+            _in("CAST(strftime('%m', date) AS INTEGER)", list(months))
+        for column, value in [('lat', lat), ('lon', lon), ('ice_thickness', ice_thickness),
+                              ('snow_depth', snow_depth)]:
+            if value is not None:
+                _range(column, value)
+        if where is not None:
+            conditions.append("(%s)" % where)
+            values.extend(params)
+
+        sql = ("SELECT cores.*, (SELECT group_concat(variable, ', ') FROM variables "
+               "WHERE variables.path = cores.path) AS variables FROM cores")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY date, name"
+        return pd.read_sql_query(sql, self.conn, params=values)
+
+    def select_paths(self, **kwargs):
+        """
+        :param kwargs:
+            selection criteria, see query
+        :return:
+            list of string, path of the selected ice core files
+        """
+        return self.query(**kwargs)['path'].tolist()
@@ -0,0 +1,187 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.collection.py : graph of the ice core collections
+
+Cores are the nodes of the graph; each core is linked to the cores of its collection, i.e. the cores sampled together.
+A sampling event is a connected component of the graph.
+"""
+import logging
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "classes to handle the collection of ice cores"
+__CoreVersion__ = 1.1
+
+__all__ = ["CollectionGraph", "prune_collections"]
+
+
+class CollectionGraph:
+    """
+    CollectionGraph, collection of each core, with the reverse lookup of the cores holding a core in their collection
+    """
+
+    def __init__(self):
+        self._collection = {}  # core: set of the cores of its collection
+        self._holders = {}  # core: set of the cores holding it in their collection
+
+    def __contains__(self, core):
+        return core in self._collection
+
+    def __len__(self):
+        return self._collection.__len__()
+
+    def add_core(self, core, collection):
+        """
+        :param core:
+            string, core name
+        :param collection:
+            list of string, cores of the collection of core
+        """
+        self._collection.setdefault(core, set())
+        for c in collection:
+            self._collection[core].add(c)
+            self._holders.setdefault(c, set()).add(core)
+
+    @classmethod
+    def from_cores(cls, ic_dict):
+        """
+        :param ic_dict:
+            dict, core name: seaice.Core
+        :return:
+            CollectionGraph
+        """
+        graph = cls()
+        for name, ic_data in ic_dict.items():
+            graph.add_core(name, ic_data.collection)
+        return graph
+
+    @classmethod
+    def from_stack(cls, ics_stack):
+        """
+        :param ics_stack:
+            CoreStack, with the columns name and collection
+        :return:
+            CollectionGraph
+        """
+        graph = cls()
+        if ics_stack.empty or 'collection' not in ics_stack:
+            return graph
+        for name, collection in ics_stack[['name', 'collection']].drop_duplicates().values:
+            graph.add_core(name, collection.split(', ') if isinstance(collection, str) else [])
+        return graph
+
+    def cores(self):
+        """
+        :return:
+            list of string, sorted names of the cores
+        """
+        return sorted(self._collection)
+
+    def collection(self, core):
+        """
+        :param core:
+            string, core name
+        :return:
+            list of string, sorted collection of core. Empty if core is not in the graph.
+        """
+        return sorted(self._collection.get(core, ()))
+
+    def collection_string(self, core):
+        """
+        :return:
+            string, collection of core as in the collection column of a CoreStack
+        """
+        return ', '.join(self.collection(core))
+
+    def in_collection(self, core, other):
+        """
+        :return:
+            boolean, True if other is in the collection of core
+        """
+        return other in self._collection.get(core, ())
+
+    def holders(self, core):
+        """
+        :return:
+            list of string, sorted names of the cores holding core in their collection
+        """
+        return sorted(self._holders.get(core, ()))
+
+    def prune(self, cores):
+        """
+        Remove cores from the collection of all cores
+
+        :param cores:
+            list of string, names of the cores to remove
+        :return:
+            dict, core name: sorted list of the cores removed from its collection
+        """
+        pruned = {}
+        for core in set(cores):
+            for holder in self._holders.pop(core, ()):
+                self._collection[holder].discard(core)
+                pruned.setdefault(holder, []).append(core)
+        return {holder: sorted(removed) for holder, removed in pruned.items()}
+
+    def _neighbors(self, core):
+        return self._collection.get(core, set()) | self._holders.get(core, set())
+
+    def component(self, core):
+        """
+        :param core:
+            string, core name
+        :return:
+            list of string, sorted names of the cores sampled with core, directly or through other collections
+        """
+        if core not in self._collection and core not in self._holders:
+            return []
+        visited = {core}
+        queue = [core]
+        while queue:
+            for c in self._neighbors(queue.pop()):
+                if c not in visited:
+                    visited.add(c)
+                    queue.append(c)
+        return sorted(visited)
+
+    def components(self):
+        """
+        :return:
+            list of list of string, sampling events: the connected components of the graph, sorted
+        """
+        components = []
+        visited = set()
+        for core in sorted(set(self._collection) | set(self._holders)):
+            if core not in visited:
+                component = self.component(core)
+                visited.update(component)
+                components.append(component)
+        return components
+
+
+def prune_collections(ic_dict, cores):
+    """
+    Remove cores, e.g. missing or without profile, from the collection of the cores of ic_dict
+
+    :param ic_dict:
+        dict, core name: seaice.Core
+    :param cores:
+        list of string, names of the cores to remove
+    :return:
+        CollectionGraph, collection graph of ic_dict once pruned
+    """
+    logger = logging.getLogger(__name__)
+
+    graph = CollectionGraph.from_cores(ic_dict)
+    for core, removed in graph.prune(cores).items():
+        if core in ic_dict:
+            ic_dict[core].del_from_collection(removed)
+            logger.info("remove %s from %s collection" % (', '.join(removed), core))
+    return graph
@@ -0,0 +1,248 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.columnar.py : import and export of ice core data in long format table (CSV, Parquet)
+
+Layout of the table, one row per section (step profile) or measurement (continuous profile) of a variable:
+
+    core metadata, repeated on every row of the core:
+        name            core name
+        date            ISO 8601 date of coring, with the UTC offset if known, e.g. 2015-05-13 13:00:00-08:00
+        origin          location name
+        lat, lon        decimal degree
+        ice_thickness   m, several measurements are separated by ', '
+        freeboard       m, idem
+        snow_depth      m, idem
+        collection      names of the cores of the collection separated by ', ', default to the core name
+        core_comment    core comment, e.g. 'T2-B1; linear profile'
+        t_air, t_snow_surface, t_ice_surface, t_water, protocol
+    profile:
+        variable        variable name, e.g. salinity, temperature (see seaice.core.schema)
+        y_low, y_sup    section depth (m), empty for continuous profile
+        y_mid           section or measurement depth (m)
+        length          ice core length (m)
+        note            note of the variable sheet
+        v_ref           'top' or 'bottom', vertical reference
+        comment         comment on the section
+        any other column is a measured value, e.g. 'salinity', 'conductivity measurement temperature'. The value
+        columns of a variable are the columns named after the variable and the value columns holding data for the
+        variable.
+
+Only name, variable and y_mid are required. Rows of a core and of a variable are kept in the order of the table.
+"""
+import logging
+
+import dateutil.parser
+import numpy as np
+import pandas as pd
+import seaice
+from seaice.core.schema import STEP_COLUMNS, get_plan, typed_profile
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to read and write ice core data in csv and parquet long format"
+__CoreVersion__ = 1.1
+
+__all__ = ["import_ic_csv", "import_ic_parquet", "import_ic_table", "export_ic_csv", "export_ic_parquet", "ic_table"]
+
+CORE_COLUMNS = ['name', 'date', 'origin', 'lat', 'lon', 'ice_thickness', 'freeboard', 'snow_depth', 'collection',
+                'core_comment', 't_air', 't_snow_surface', 't_ice_surface', 't_water', 'protocol']
+# profile columns following the value columns, in the order of the xlsx import
+PROFILE_COLUMNS = ['comment', 'length', 'note', 'v_ref', 'variable', 'name']
+MULTIPLE_VALUE_COLUMNS = ['ice_thickness', 'freeboard', 'snow_depth']
+
+
+def _value(value):
+    """
+    Cell value of the table, with missing values as None
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value
+
+
+def _array(value):
+    """
+    Measurements of the core metadata (ice thickness, freeboard, snow depth) as an array of float
+    """
+    value = _value(value)
+    if value is None:
+        return np.array([np.nan])
+    if isinstance(value, str):
+        return pd.to_numeric(np.array([v.strip() for v in value.split(',')]), errors='coerce').astype(float)
+    return np.array([value]).astype(float)
+
+
+def import_ic_table(table):
+    """
+    Build ice cores from a long format table, see the module documentation for the layout
+
+    :param table:
+        pd.DataFrame
+    :return:
+        dict, core name: seaice.Core, in the order of the table
+    """
+    logger = logging.getLogger(__name__)
+
+    for column in ['name', 'variable', 'y_mid']:
+        if column not in table:
+            logger.error("column %s missing from the ice core table" % column)
+            return {}
+    value_columns = [column for column in table.columns
+                     if column not in CORE_COLUMNS + PROFILE_COLUMNS + STEP_COLUMNS]
+    plan = get_plan(__CoreVersion__)
+
+    ic_dict = {}
+    for name, core_table in table.groupby('name', sort=False):
+        metadata = {column: _value(core_table[column].iloc[0]) if column in core_table else None
+                    for column in CORE_COLUMNS}
+        date = metadata['date']
+        if isinstance(date, str):
+            date = dateutil.parser.parse(date)
+        elif isinstance(date, pd.Timestamp):
+            date = date.to_pydatetime()
+        ic_data = seaice.Core(name, date, metadata['origin'],
+                              np.nan if metadata['lat'] is None else metadata['lat'],
+                              np.nan if metadata['lon'] is None else metadata['lon'],
+                              _array(metadata['ice_thickness']), _array(metadata['freeboard']),
+                              _array(metadata['snow_depth']))
+        if metadata['collection'] is not None:
+            ic_data.add_to_collection([c.strip() for c in str(metadata['collection']).split(',')])
+        for attr in ['t_air', 't_snow_surface', 't_ice_surface', 't_water']:
+            if metadata[attr] is not None:
+                setattr(ic_data, attr, metadata[attr])
+        ic_data.protocol = metadata['protocol']
+
+        for variable, variable_table in core_table.groupby('variable', sort=False):
+            if variable in plan.variables:
+                step = plan.variables[variable].kind == 'step'
+            else:
+                step = any(column in variable_table and variable_table[column].notna().any()
+                           for column in ['y_low', 'y_sup'])
+            columns = (STEP_COLUMNS if step else ['y_mid'])
+            columns = columns + [column for column in value_columns
+                                 if column == variable or variable_table[column].notna().any()]
+
+            profile = pd.DataFrame(index=range(variable_table.__len__()))
+            for column in columns:
+                if column in variable_table:
+                    profile[column] = pd.to_numeric(variable_table[column].values, errors='coerce')
+                else:
+                    profile[column] = np.nan
+            for column in PROFILE_COLUMNS:
+                if column in ['variable', 'name']:
+                    profile[column] = variable_table[column].values
+                elif column == 'length':
+                    profile[column] = (pd.to_numeric(variable_table[column].values, errors='coerce')
+                                       if column in variable_table else np.nan)
+                elif column == 'v_ref' and column not in variable_table:
+                    profile[column] = 'top'
+                else:
+                    profile[column] = ([_value(v) for v in variable_table[column].values] if column in variable_table
+                                       else None)
+            ic_data.add_profile(typed_profile(profile))
+        ic_data.comment = metadata['core_comment']
+        ic_dict[name] = ic_data
+        logger.info('\t(%s) variables %s imported with success' % (name, ", ".join(ic_data.variables())))
+    return ic_dict
+
+
+def import_ic_csv(f_path, **kwargs):
+    """
+    Import the ice cores of a CSV file in long format
+
+    :param f_path:
+        string, path to the csv file
+    :param kwargs:
+        keyword arguments passed to pd.read_csv, e.g. sep
+    :return:
+        dict, core name: seaice.Core
+    """
+    # only empty cells are missing values, 'n/a' is a valid entry of the summary
+    kwargs.setdefault('keep_default_na', False)
+    kwargs.setdefault('na_values', [''])
+    return import_ic_table(pd.read_csv(f_path, **kwargs))
+
+
+def import_ic_parquet(f_path, **kwargs):
+    """
+    Import the ice cores of a Parquet file in long format. Requires pyarrow or fastparquet.
+
+    :param f_path:
+        string, path to the parquet file
+    :param kwargs:
+        keyword arguments passed to pd.read_parquet
+    :return:
+        dict, core name: seaice.Core
+    """
+    return import_ic_table(pd.read_parquet(f_path, **kwargs))
+
+
+def ic_table(ic_dict):
+    """
+    Long format table of ice cores, see the module documentation for the layout
+
+    :param ic_dict:
+        dict of seaice.Core
+    :return:
+        pd.DataFrame
+    """
+    tables = []
+    for ic_data in ic_dict.values():
+        table = ic_data.profile.copy()
+        if table.empty:
+            continue
+        date = ic_data.date.isoformat(sep=' ') if ic_data.date is not None else None
+        table['date'] = date
+        table['origin'] = ic_data.origin
+        table['lat'] = ic_data.lat
+        table['lon'] = ic_data.lon
+        for column in MULTIPLE_VALUE_COLUMNS:
+            values = getattr(ic_data, column)
+            table[column] = values[0] if values.__len__() == 1 else ', '.join([str(v) for v in values])
+        table['collection'] = ', '.join(ic_data.collection)
+        table['core_comment'] = ic_data.comment
+        for attr in ['t_air', 't_snow_surface', 't_ice_surface', 't_water', 'protocol']:
+            table[attr] = getattr(ic_data, attr)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=CORE_COLUMNS + ['variable', 'y_mid'])
+    table = pd.concat(tables, sort=False, ignore_index=True)
+    columns = CORE_COLUMNS + ['variable'] + [c for c in table.columns if c not in CORE_COLUMNS + ['variable']]
+    return table[columns]
+
+
+def export_ic_csv(ic_dict, f_path, **kwargs):
+    """
+    :param ic_dict:
+        dict of seaice.Core
+    :param f_path:
+        string, path to the csv file
+    :param kwargs:
+        keyword arguments passed to pd.DataFrame.to_csv
+    """
+    ic_table(ic_dict).to_csv(f_path, index=False, **kwargs)
+
+
+def export_ic_parquet(ic_dict, f_path, **kwargs):
+    """
+    Requires pyarrow or fastparquet. Columns of mixed type (e.g. t_air) are stored as string.
+
+    :param ic_dict:
+        dict of seaice.Core
+    :param f_path:
+        string, path to the parquet file
+    :param kwargs:
+        keyword arguments passed to pd.DataFrame.to_parquet
+    """
+    table = ic_table(ic_dict)
+    for column in table.columns:
+        if table[column].dtype == object:
+            table[column] = [None if _value(v) is None else str(v) for v in table[column]]
+    table.to_parquet(f_path, index=False, **kwargs)
@@ -9,6 +9,8 @@ import numpy as np
 import pandas as pd
 import datetime as dt
 from seaice.core.profile import *
+from seaice.core.collection import CollectionGraph
+from seaice.core.schema import concat_profiles
 
 __name__ = "corestack"
 __author__ = "Marc Oggier"
@@ -22,20 +24,56 @@ __date__ = "2017/09/13"
 __comment__ = "corestack.py contained classes to handle ice core data"
 __CoreVersion__ = 1.1
 
-__all__ = ["CoreStack", "stack_cores"]
+__all__ = ["CoreStack", "stack_cores", "stack_cores_iter"]
 
 TOL = 1e-6
 
+# core metadata added as columns to the profiles of a stack
+METADATA_COLUMNS = ['ice_thickness', 'freeboard', 'snow_depth', 'date', 'collection']
+
+# columns repeating a few strings on every row, stored as categorical by CoreStack.categorize
+CATEGORICAL_COLUMNS = ['name', 'variable', 'v_ref', 'collection', 'comment', 'note']
+
+
+class _StackIndexer:
+    """
+    Indexer of a CoreStack (loc, iloc, at, iat), discarding the row positions cached by group_rows on assignment
+    """
+
+    def __init__(self, indexer, ics_stack):
+        self._indexer = indexer
+        self._ics_stack = ics_stack
+
+    def __call__(self, *args, **kwargs):
+        return _StackIndexer(self._indexer(*args, **kwargs), self._ics_stack)
+
+    def __getattr__(self, name):
+        return getattr(self._indexer, name)
+
+    def __getitem__(self, key):
+        return self._indexer[key]
+
+    def __setitem__(self, key, value):
+        self._ics_stack.reset_group_rows()
+        self._indexer[key] = value
+
 
 class CoreStack(pd.DataFrame):
     """
         CoreStack
     """
+    # collection graph of the stacked cores, see collection_graph
+    _metadata = ['_collection_graph']
+    _collection_graph = None
+    # row positions of each group of rows, with the index they were computed for, see group_rows. Not in _metadata:
+    # the positions are not valid for the frames derived from the stack. Discarded when values are assigned.
+    _row_offsets = None
 
     def __getstate__(self):
         d = self.__dict__.copy()
         if 'logger' in d.keys():
             d['logger'] = d['logger'].name
+        d.pop('_row_offsets', None)
         return d
 
     def __setstate__(self, d):
@@ -47,51 +85,129 @@ class CoreStack(pd.DataFrame):
         super(CoreStack, self).__init__(*args, **kwargs)
         self.logger = logging.getLogger(__name__)
 
+    def __setitem__(self, key, value):
+        self.reset_group_rows()
+        super(CoreStack, self).__setitem__(key, value)
+
+    @property
+    def loc(self):
+        return _StackIndexer(super(CoreStack, self).loc, self)
+
+    @property
+    def iloc(self):
+        return _StackIndexer(super(CoreStack, self).iloc, self)
+
+    @property
+    def at(self):
+        return _StackIndexer(super(CoreStack, self).at, self)
+
+    @property
+    def iat(self):
+        return _StackIndexer(super(CoreStack, self).iat, self)
+
     def add_profile(self, profile):
         """
 
         :param profile:
         :return:
         """
-        return CoreStack(self.append(profile, sort=False))
+        return CoreStack(concat_profiles([self, profile], sort=False))
 
-    def delete_profile(self, variable_dict):
+    def group_rows(self, columns=('name', 'variable')):
         """
+        Row positions of each group of rows sharing the same values of columns, e.g. of each core with ('name',) or of
+        each profile with ('name', 'variable'). The positions are cached for the index of the stack, and discarded when
+        values are assigned to the stack, e.g. stack.loc[rows, 'name'] = name. Call reset_group_rows after modifying the
+        stack in place otherwise, e.g. with stack.replace(..., inplace=True).
 
+        :param columns:
+            tuple of string, default ('name', 'variable')
+        :return:
+            dict, group key (value for a single column, tuple of values otherwise): np.array of row positions, in the
+            order of the stack. Rows with a nan key are in no group.
+        """
+        columns = tuple(columns)
+        if self.empty:
+            return {}
+        if self._row_offsets is None or self._row_offsets[0] is not self.index:
+            self._row_offsets = (self.index, {})
+        offsets = self._row_offsets[1]
+        if columns not in offsets:
+            by = columns[0] if columns.__len__() == 1 else list(columns)
+            offsets[columns] = self.groupby(by, sort=False, observed=True).indices
+        return offsets[columns]
+
+    def reset_group_rows(self):
+        """
+        Discard the row positions cached by group_rows
+        """
+        self._row_offsets = None
+
+    def _profile_rows(self, variable_dict):
+        """
         :param variable_dict:
+            dict, column: value
         :return:
+            np.array, sorted positions of the rows matching all the values of variable_dict for the columns of the
+            stack, or None if no column of variable_dict is in the stack
         """
-        return CoreStack(delete_profile(self, variable_dict))
+        keys = [key for key in ['name', 'variable'] if key in variable_dict and key in self.columns.values]
+        others = [key for key in variable_dict if key not in keys and key in self.columns.values]
+        if not keys and not others:
+            return None
+
+        # name and variable from the cached positions, other columns with a mask on the selected rows
+        if keys:
+            key = variable_dict[keys[0]] if keys.__len__() == 1 else tuple(variable_dict[k] for k in keys)
+            try:
+                rows = self.group_rows(tuple(keys)).get(key, np.array([], dtype=int))
+            except TypeError:
+                # unhashable value
+                rows = np.array([], dtype=int)
+        else:
+            rows = np.arange(self.__len__())
+        for key in others:
+            rows = rows[(self[key].iloc[rows] == variable_dict[key]).values]
+        return rows
 
-    def add_profiles(self, ic_data):
+    def select_profile(self, variable_dict):
         """
-        :param ic_data:
+        :param variable_dict:
+            dict, column: value. Select the rows matching all the values, see seaice.core.profile.select_profile
         :return:
+            CoreStack
         """
-        if ic_data.variables().size > 0:
-            self.logger.info("Adding %s profiles for core %s" % (", ".join(ic_data.variables()), ic_data.name))
-            profile = ic_data.profile
-            #profile['name'] = ic_data.name
-            #profile['length'] = ic_data.length[~np.isnan(ic_data.length())].mean()
-            if ic_data.ice_thickness.__len__() == 1 and isinstance(ic_data.ice_thickness[0], (int, float)):
-                profile['ice_thickness'] = ic_data.ice_thickness[0]
-            else:
-                profile['ice_thickness'] = np.nanmean(ic_data.ice_thickness)
-                logging.info("ice thickness is the mean of all not-nan ice thickness")
+        rows = self._profile_rows(variable_dict)
+        if rows is None:
+            return CoreStack(self)
+        return CoreStack(self.iloc[rows])
 
-            if ic_data.freeboard.__len__() == 1 and isinstance(ic_data.freeboard[0], (int, float)):
-                profile['freeboard'] = ic_data.freeboard[0]
-            else:
-                profile['freeboard'] = np.nanmean(ic_data.freeboard)
+    def delete_profile(self, variable_dict):
+        """
 
-            if ic_data.snow_depth.__len__() == 1 and isinstance(ic_data.snow_depth[0], (int, float)):
-                profile['snow_depth'] = ic_data.snow_depth[0]
-            else:
-                profile['snow_depth'] = np.nanmean(ic_data.snow_depth)
+        :param variable_dict:
+            dict, column: value. Delete the rows matching all the values, see seaice.core.profile.delete_profile
+        :return:
+            CoreStack
+        """
+        rows = self._profile_rows(variable_dict)
+        if rows is None:
+            return CoreStack(self)
+        keep = np.ones(self.__len__(), dtype=bool)
+        keep[rows] = False
+        return CoreStack(self.iloc[keep])
 
-            profile['date'] = ic_data.date
-            profile['collection'] = ', '.join(ic_data.collection)
-            temp = self.append(profile, sort=False).reset_index(drop=True)
+    def add_profiles(self, ic_data, variables=None):
+        """
+        :param ic_data:
+        :param variables:
+            list of string, default None. Variables to add. If None, add all variables of the core. For a lazy core,
+            only the sheets holding the variables are read.
+        :return:
+        """
+        profile = stack_profile(ic_data, variables=variables)
+        if profile is not None:
+            temp = concat_profiles([self, profile], sort=False).reset_index(drop=True)
             return CoreStack(temp)
         else:
             return CoreStack(self)
@@ -122,7 +238,7 @@ class CoreStack(pd.DataFrame):
         :return:
         """
 
-        return CoreStack(grouped_stat(self, groups=groups, variables=variables, stats=stats))
+        return self._keep_categorical(CoreStack(grouped_stat(self, groups=groups, variables=variables, stats=stats)))
 
     def discretize(self, y_bins=None, y_mid=None, variables=None, display_figure=False, fill_gap=False,
                    fill_extremity=False):
@@ -139,14 +255,18 @@ class CoreStack(pd.DataFrame):
         if variables is None:
             variables = self.variable.unique().tolist()
 
-        data_binned = pd.DataFrame()
+        # rows of each core from the cached positions, instead of a mask over the stack for each core
+        core_rows = self.group_rows(('name',))
+        data_binned = []
         for core in self.name.unique():
-            data_binned = data_binned.append(
-                discretize_profile(self[self.name == core], y_bins=y_bins, y_mid=y_mid, variables=variables,
-                                   display_figure=display_figure, fill_gap=fill_gap, fill_extremity=fill_extremity))
+            data_binned.append(
+                discretize_profile(self.iloc[core_rows.get(core, [])], y_bins=y_bins, y_mid=y_mid,
+                                   variables=variables, display_figure=display_figure, fill_gap=fill_gap,
+                                   fill_extremity=fill_extremity))
+        data_binned = concat_profiles(data_binned, sort=False)
         data_binned.reset_index(drop=True, inplace=True)
         # TODO: check that format of column match before and after discretization
-        return CoreStack(data_binned)
+        return self._keep_categorical(CoreStack(data_binned))
 
     def compute_phys_prop(self, inplace=True):
         """
@@ -163,38 +283,226 @@ class CoreStack(pd.DataFrame):
         :param v_ref:
         :return:
         """
-        temp = CoreStack()
+        core_rows = self.group_rows(('name',))
+        temp = []
         for f_core in self.name.unique():
-            ic_data = self[self.name == f_core]
+            ic_data = self.iloc[core_rows.get(f_core, [])]
             ic_data = set_vertical_reference(ic_data, new_v_ref=new_v_ref, h_ref=h_ref)
-            temp = temp.append(ic_data)
-        return CoreStack(temp)
+            temp.append(ic_data)
+        return self._keep_categorical(CoreStack(concat_profiles(temp, sort=False)))
+
+    def categorize(self, columns=None):
+        """
+        Store the columns repeating a few strings as pandas categoricals, which reduces the memory of the stack and
+        speeds up the comparison masks, e.g. ics_stack.name == core. The categorical columns are kept by discretize,
+        set_vertical_reference and section_stat.
+
+        :param columns:
+            list of string, default None. Columns to store as categorical. If None, CATEGORICAL_COLUMNS
+        :return:
+            CoreStack
+        """
+        return self._set_categorical(columns, True)
+
+    def decategorize(self, columns=None):
+        """
+        Store the categorical columns as object strings
+
+        :param columns:
+            list of string, default None. Columns to store as object. If None, CATEGORICAL_COLUMNS
+        :return:
+            CoreStack
+        """
+        return self._set_categorical(columns, False)
+
+    def _set_categorical(self, columns, categorical):
+        if columns is None:
+            columns = CATEGORICAL_COLUMNS
+        # by position, the stack returned by section_stat may hold a column twice
+        data = []
+        for ii_col, column in enumerate(self.columns):
+            values = self.iloc[:, ii_col]
+            if column in columns and isinstance(values.dtype, pd.CategoricalDtype) != categorical:
+                values = values.astype('category' if categorical else object)
+            data.append(values)
+        if data:
+            ics_stack = CoreStack(pd.concat(data, axis=1))
+        else:
+            ics_stack = CoreStack(self.copy())
+        ics_stack._collection_graph = self._collection_graph
+        return ics_stack
+
+    def is_categorical(self):
+        """
+        :return:
+            boolean, True if all the CATEGORICAL_COLUMNS of the stack are categorical
+        """
+        dtypes = [dtype for column, dtype in self.dtypes.items() if column in CATEGORICAL_COLUMNS]
+        return dtypes.__len__() > 0 and all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes)
+
+    def _keep_categorical(self, ics_stack):
+        """
+        :param ics_stack:
+            CoreStack, computed from self
+        :return:
+            CoreStack, with the categorical columns categorical if self is categorical
+        """
+        if self.is_categorical():
+            return ics_stack.categorize()
+        return ics_stack
+
+    def collection_graph(self):
+        """
+        :return:
+            CollectionGraph, collection graph of the stacked cores. Built from the collection column if the stack was
+            not created by stack_cores.
+        """
+        if self._collection_graph is None:
+            self._collection_graph = CollectionGraph.from_stack(self)
+        return self._collection_graph
 
     def core_in_collection(self, core):
-        temp = self.loc[self.name == core, 'collection'].values
-        col = []
-        for ii in range(0, temp.__len__()):
-            for c in temp[ii].split(', '):
-                if c not in col:
-                    col.append(c)
-        return sorted(col)
+        return self.collection_graph().collection(core)
 
 
 # Ice core operation
-def stack_cores(ics_dict):
+def stack_cores(ics_dict, categorical=False):
     """"
     :param ics_dict:
         dictionnary of core
+    :param categorical:
+        boolean, default False. If True, the CATEGORICAL_COLUMNS are stored as categorical, see CoreStack.categorize
     :return ics_stack:
         panda.DataFrame()
     """
     logger = logging.getLogger(__name__)
     logger.info("Stacking ice cores:")
-    ics_stack = CoreStack()
-    for key in ics_dict.keys():
-        ics_stack = ics_stack.add_profiles(ics_dict[key])
-    ics_stack.reset_index(drop=True)
-    return CoreStack(ics_stack)
+
+    # the profiles are concatenated at once, and the core metadata added as columns afterward
+    profiles = []
+    metadata = []
+    columns = []
+    for ic_data in ics_dict.values():
+        profile = ic_data.get_profile()
+        if 'variable' in profile and profile.variable.unique().size > 0:
+            logger.info("Adding %s profiles for core %s" % (", ".join(profile.variable.unique()), ic_data.name))
+            profiles.append(profile)
+            metadata.append(_core_metadata(ic_data))
+            # order of the columns of the stack built core by core
+            columns += [column for column in profile.columns.tolist() + METADATA_COLUMNS if column not in columns]
+    if not profiles:
+        ics_stack = CoreStack()
+        ics_stack._collection_graph = CollectionGraph()
+        return ics_stack
+
+    ics_stack = concat_profiles(profiles, sort=False).reset_index(drop=True)
+    rows = np.repeat(np.arange(profiles.__len__()), [profile.__len__() for profile in profiles])
+    metadata = pd.DataFrame(metadata, columns=METADATA_COLUMNS)
+    for column in METADATA_COLUMNS:
+        ics_stack[column] = metadata[column].take(rows).reset_index(drop=True)
+    ics_stack = CoreStack(ics_stack[columns])
+    if categorical:
+        ics_stack = ics_stack.categorize()
+
+    stacked = set(ics_stack.name)
+    ics_stack._collection_graph = CollectionGraph.from_cores({ic_data.name: ic_data for ic_data in ics_dict.values()
+                                                             if ic_data.name in stacked})
+    return ics_stack
+
+
+def stack_cores_iter(ic_iter, chunk_size=50, inexisting_ic_list=None, categorical=False):
+    """
+    Stack cores yielded one at a time, e.g. by iter_ic_list. The profiles are concatenated by chunk of chunk_size
+    cores, so that the cores do not need to be all held in memory before stacking.
+
+    :param ic_iter:
+        iterable of seaice.Core
+    :param chunk_size:
+        int, default 50. Number of core profiles concatenated at once
+    :param inexisting_ic_list:
+        list of string, default None. Cores removed from the collection column once all cores are stacked. Pass the
+        list filled by iter_ic_list to obtain the same stack than import_ic_list and stack_cores.
+    :param categorical:
+        boolean, default False. If True, the CATEGORICAL_COLUMNS are stored as categorical, see CoreStack.categorize
+    :return ics_stack:
+        CoreStack
+    """
+    logger = logging.getLogger(__name__)
+    logger.info("Stacking ice cores:")
+
+    chunks = []
+    profiles = []
+    graph = CollectionGraph()
+    for ic_data in ic_iter:
+        profile = stack_profile(ic_data)
+        if profile is not None:
+            profiles.append(profile)
+            graph.add_core(ic_data.name, ic_data.collection)
+        if profiles.__len__() >= chunk_size:
+            chunks.append(concat_profiles(profiles, sort=False))
+            profiles = []
+    if profiles:
+        chunks.append(concat_profiles(profiles, sort=False))
+    if not chunks:
+        return CoreStack()
+    ics_stack = concat_profiles(chunks, sort=False).reset_index(drop=True)
+
+    if inexisting_ic_list and 'collection' in ics_stack:
+        logger.info("%s core does not exits. Removing from collection" % ', '.join(inexisting_ic_list))
+        pruned = graph.prune(inexisting_ic_list)
+        if pruned:
+            rows = ics_stack.name.isin(list(pruned))
+            ics_stack.loc[rows, 'collection'] = ics_stack.loc[rows, 'name'].map(graph.collection_string)
+    ics_stack = CoreStack(ics_stack)
+    if categorical:
+        ics_stack = ics_stack.categorize()
+    ics_stack._collection_graph = graph
+    return ics_stack
+
+
+def stack_profile(ic_data, variables=None):
+    """
+    Profile of a core, with the core metadata (ice thickness, freeboard, snow depth, date, collection) added as columns
+
+    :param ic_data:
+        seaice.Core
+    :param variables:
+        list of string, default None. Variables to add. If None, add all variables of the core. For a lazy core,
+        only the sheets holding the variables are read.
+    :return:
+        pd.DataFrame, or None if the core has no profile
+    """
+    logger = logging.getLogger(__name__)
+
+    # copy: the metadata columns are not added to the profile of the core
+    profile = ic_data.get_profile(variables).copy()
+    if 'variable' in profile and profile.variable.unique().size > 0:
+        logger.info("Adding %s profiles for core %s" % (", ".join(profile.variable.unique()), ic_data.name))
+        for column, value in _core_metadata(ic_data).items():
+            profile[column] = value
+        return profile
+    return None
+
+
+def _core_metadata(ic_data):
+    """
+    :param ic_data:
+        seaice.Core
+    :return:
+        dict, value of the METADATA_COLUMNS for the core. Several measurements are averaged.
+    """
+    metadata = {}
+    for column in ['ice_thickness', 'freeboard', 'snow_depth']:
+        values = getattr(ic_data, column)
+        if values.__len__() == 1 and isinstance(values[0], (int, float)):
+            metadata[column] = values[0]
+        else:
+            metadata[column] = np.nanmean(values)
+            if column == 'ice_thickness':
+                logging.info("ice thickness is the mean of all not-nan ice thickness")
+    metadata['date'] = ic_data.date
+    metadata['collection'] = ', '.join(ic_data.collection)
+    return metadata
 
 
 def grouped_stat(ics_stack, groups, variables=None, stats=['min', 'mean', 'max', 'std']):
@@ -0,0 +1,138 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.dedup.py : detection of duplicated ice core files in a list of ice core spreadsheet
+
+Source lists often hold copies of the same spreadsheet, e.g. in a backup directory or in the 'version-VERSION'
+directories created by update_spreadsheet. Byte-identical copies are skipped. Different files with the same core name
+are conflicts, solved by a policy without parsing the files:
+    'first'     keep the first file of the list
+    'last'      keep the last file of the list
+    'newest'    keep the most recently modified file
+    'skip'      keep none of the files
+"""
+import logging
+import os
+
+import pandas as pd
+from seaice.core.cache import file_hash
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to detect duplicated ice core spreadsheet"
+__CoreVersion__ = 1.1
+
+__all__ = ["find_duplicates", "dedup_ic_list"]
+
+DUPLICATE_COLUMNS = ['path', 'name', 'hash', 'status', 'duplicate_of']
+POLICIES = ['first', 'last', 'newest', 'skip']
+
+
+def _core_name(ic_path):
+    return ic_path.split('/')[-1].split('.')[0]
+
+
+def find_duplicates(ic_list, policy='first'):
+    """
+    :param ic_list:
+        array, absolute filepath of the cores. Missing files are ignored.
+    :param policy:
+        'first', 'last', 'newest' or 'skip', default 'first'. File kept among different files with the same core name,
+        see the module documentation
+    :return:
+        pd.DataFrame, one row per existing file in the order of ic_list, with columns path, name (core name from the
+        file name), hash (only computed for files whose size is not unique), status and duplicate_of. status is 'kept',
+        'duplicate' for a copy of the file duplicate_of, or 'conflict' for a file with the same core name than the kept
+        file duplicate_of (None with the policy 'skip').
+    """
+    logger = logging.getLogger(__name__)
+
+    if policy not in POLICIES:
+        logger.error("duplicate policy %s unknown, using 'first'" % policy)
+        policy = 'first'
+
+    ic_paths = [ic_path for ic_path in ic_list if os.path.exists(ic_path)]
+    sizes = {ic_path: os.path.getsize(ic_path) for ic_path in ic_paths}
+    size_count = pd.Series(list(sizes.values())).value_counts() if sizes else pd.Series(dtype=int)
+
+    # byte-identical files have the same size: only files sharing their size with another file are hashed
+    records = []
+    hash_2_path = {}
+    path_2_record = {}
+    for ic_path in ic_paths:
+        record = {'path': ic_path, 'name': _core_name(ic_path), 'hash': None, 'status': 'kept', 'duplicate_of': None}
+        if size_count[sizes[ic_path]] > 1:
+            record['hash'] = file_hash(ic_path)
+            if record['hash'] in hash_2_path:
+                record['status'] = 'duplicate'
+                record['duplicate_of'] = hash_2_path[record['hash']]
+            else:
+                hash_2_path[record['hash']] = ic_path
+        # the same file may be listed twice
+        if ic_path in path_2_record:
+            record['status'] = 'duplicate'
+            record['duplicate_of'] = ic_path
+        else:
+            path_2_record[ic_path] = record
+        records.append(record)
+
+    name_2_records = {}
+    for record in records:
+        if record['status'] == 'kept':
+            name_2_records.setdefault(record['name'], []).append(record)
+    for name, name_records in name_2_records.items():
+        if name_records.__len__() < 2:
+            continue
+        if policy == 'first':
+            kept = name_records[0]
+        elif policy == 'last':
+            kept = name_records[-1]
+        elif policy == 'newest':
+            kept = max(name_records, key=lambda r: os.path.getmtime(r['path']))
+        else:
+            kept = None
+        for record in name_records:
+            if record is not kept:
+                record['status'] = 'conflict'
+                record['duplicate_of'] = kept['path'] if kept is not None else None
+        logger.warning("%i different files for core %s: %s. %s" %
+                       (name_records.__len__(), name, ', '.join([r['path'] for r in name_records]),
+                        'keeping %s' % kept['path'] if kept is not None else 'skipping all'))
+
+    for record in records:
+        if record['status'] == 'duplicate':
+            logger.info("%s is a copy of %s, skipping it" % (record['path'], record['duplicate_of']))
+    return pd.DataFrame(records, columns=DUPLICATE_COLUMNS)
+
+
+def dedup_ic_list(ic_list, policy='first'):
+    """
+    Remove the duplicated and conflicting files from a list of ice core, see find_duplicates
+
+    :param ic_list:
+        array, absolute filepath of the cores
+    :param policy:
+        'first', 'last', 'newest' or 'skip', default 'first'
+    :return:
+        tuple (ic_list, report). ic_list is the list of the files to import, missing files included, in the order of
+        the input; report is the pd.DataFrame returned by find_duplicates.
+    """
+    ic_list = list(ic_list)
+    report = find_duplicates(ic_list, policy=policy)
+    skipped = set(report.loc[report.status != 'kept', 'path'])
+    kept = set(report.loc[report.status == 'kept', 'path'])
+
+    dedup_list = []
+    for ic_path in ic_list:
+        if ic_path in kept:
+            dedup_list.append(ic_path)
+            kept.remove(ic_path)
+        elif ic_path not in skipped:
+            dedup_list.append(ic_path)
+    return dedup_list, report
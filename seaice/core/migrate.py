@@ -0,0 +1,149 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.migrate.py : bulk update of ice core spreadsheet to the latest spreadsheet version
+
+"""
+import logging
+import multiprocessing
+import os
+import time
+
+import pandas as pd
+import seaice
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to update directories of ice core spreadsheet to the latest version"
+__CoreVersion__ = 1.1
+
+__all__ = ["migrate_ic_path", "migrate_ic_list", "migrate_ic_dir"]
+
+MIGRATION_COLUMNS = ['path', 'name', 'version', 'status', 'time', 'error']
+
+
+def migrate_ic_path(ic_path, v_ref='top', backup=True, dry_run=False):
+    """
+    Update an ice core spreadsheet to the latest version (__CoreVersion__), see update_spreadsheet
+
+    :param ic_path:
+        string, path to the xlsx ice core spreadsheet
+    :param v_ref:
+        'top' or 'bottom', vertical reference written in the variable sheets
+    :param backup:
+        boolean, default True. If True, the previous file version is copied in the subdirectory 'version-VERSION'
+    :param dry_run:
+        boolean, default False. If True, only report the spreadsheet which would be updated
+    :return:
+        dict, {'path', 'name', 'version', 'status', 'time', 'error'}. status is 'updated', 'to update', 'up to date' or
+        'error'
+    """
+    t_start = time.perf_counter()
+    report = {'path': ic_path, 'name': None, 'version': None, 'status': None, 'time': None, 'error': None}
+    try:
+        wb = seaice.core.load_workbook(ic_path, backend='xml')
+        ws_summary = wb['summary']
+        report['name'] = ws_summary['C21'].value
+        report['version'] = ws_summary['C3'].value
+        wb.close()
+
+        if not isinstance(report['version'], (float, int)):
+            report['status'] = 'error'
+            report['error'] = 'ice core spreadsheet version not unavailable'
+        elif report['version'] >= __CoreVersion__:
+            report['status'] = 'up to date'
+        elif dry_run:
+            report['status'] = 'to update'
+        else:
+            seaice.core.update_spreadsheet(ic_path, v_ref=v_ref, backup=backup)
+            report['status'] = 'updated'
+    except Exception as e:
+        report['status'] = 'error'
+        report['error'] = '%s: %s' % (type(e).__name__, e)
+    report['time'] = time.perf_counter() - t_start
+    return report
+
+
+def _migrate_ic_path_worker(args):
+    """
+    Unpack migrate_ic_path arguments in a worker process
+
+    :param args:
+        tuple (ic_path, kwargs)
+    :return:
+        dict
+    """
+    ic_path, kwargs = args
+    return migrate_ic_path(ic_path, **kwargs)
+
+
+def migrate_ic_list(ic_list, v_ref='top', backup=True, dry_run=False, n_workers=None, n_slowest=5):
+    """
+    Update a list of ice core spreadsheet to the latest version with a pool of worker processes
+
+    :param ic_list:
+        array, absolute filepath of the cores
+    :param v_ref:
+        'top' or 'bottom', vertical reference written in the variable sheets
+    :param backup:
+        boolean, default True. If True, the previous file versions are copied in the subdirectory 'version-VERSION'
+    :param dry_run:
+        boolean, default False. If True, the spreadsheets are not modified; the report lists the ones to update
+    :param n_workers:
+        int or None, default None. Number of worker processes. If None, use all available cpu.
+    :param n_slowest:
+        int, default 5. Number of slowest files listed in the log summary
+    :return:
+        pd.DataFrame, one row per file with columns MIGRATION_COLUMNS, in the order of ic_list. time is in second.
+    """
+    logger = logging.getLogger(__name__)
+
+    ic_list = list(ic_list)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, ic_list.__len__()))
+
+    kwargs = {'v_ref': v_ref, 'backup': backup, 'dry_run': dry_run}
+    args = [(ic_path, kwargs) for ic_path in ic_list]
+    t_start = time.perf_counter()
+    if n_workers <= 1:
+        reports = [_migrate_ic_path_worker(arg) for arg in args]
+    else:
+        logger.info("Updating %i ice core spreadsheets with %i worker processes" % (ic_list.__len__(), n_workers))
+        with multiprocessing.Pool(n_workers) as pool:
+            reports = pool.map(_migrate_ic_path_worker, args, chunksize=1)
+    t_total = time.perf_counter() - t_start
+
+    report = pd.DataFrame(reports, columns=MIGRATION_COLUMNS)
+    for ii_row in report.index[report.status == 'error']:
+        logger.error("%s could not be updated (%s)" % (report.loc[ii_row, 'path'], report.loc[ii_row, 'error']))
+
+    status_count = report.status.value_counts()
+    logger.info("%s%i files in %.2f s (%s)" % ('dry run: ' if dry_run else '', report.__len__(), t_total,
+                                               ', '.join(['%i %s' % (n, status) for status, n in status_count.items()])))
+    if not report.empty:
+        logger.info("time per file: mean %.3f s, max %.3f s" % (report.time.mean(), report.time.max()))
+        for _, row in report.sort_values('time', ascending=False).head(n_slowest).iterrows():
+            logger.info("\t%.3f s\t%s (%s)" % (row['time'], row['path'], row['status']))
+    return report
+
+
+def migrate_ic_dir(dirpath, fileext='.xlsx', v_ref='top', backup=True, dry_run=False, n_workers=None):
+    """
+    Update all ice core spreadsheet of a directory to the latest version, see migrate_ic_list
+
+    :param dirpath:
+        string, directory containing the ice core files
+    :param fileext:
+        string, default '.xlsx'. Extension of the ice core files
+    :return:
+        pd.DataFrame, one row per file, sorted by file path
+    """
+    return migrate_ic_list(sorted(seaice.core.list_ic_path(dirpath, fileext)), v_ref=v_ref, backup=backup,
+                           dry_run=dry_run, n_workers=n_workers)
@@ -8,6 +8,7 @@ import logging
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import seaice
 
 __name__ = "profile"
 __author__ = "Marc Oggier"
@@ -395,41 +396,55 @@ def set_vertical_reference(profile, h_ref=None, new_v_ref=None):
     return profile
 
 
-def select_profile(ics_stack, variable_dict):
+def _profile_mask(ics_stack, variable_dict):
     """
-
     :param ics_stack:
+        pd.DataFrame
     :param variable_dict:
+        dict, column: value
     :return:
+        pd.Series of boolean, True for the rows matching all the values of variable_dict for the columns of
+        ics_stack, or None if no column of variable_dict is in ics_stack
     """
-    str_select = '('
-    ii_var = []
-    ii = 0
+    mask = None
     for ii_key in variable_dict.keys():
         if ii_key in ics_stack.columns.values:
-            ii_var.append(variable_dict[ii_key])
-            str_select = str_select + 'ics_stack["' + ii_key + '"]==ii_var[' + str('%d' % ii) + ']) & ('
-            ii += 1
-    str_select = str_select[:-4]
-    return ics_stack.loc[eval(str_select)]
+            if mask is None:
+                mask = ics_stack[ii_key] == variable_dict[ii_key]
+            else:
+                mask &= ics_stack[ii_key] == variable_dict[ii_key]
+    return mask
+
+
+def select_profile(ics_stack, variable_dict):
+    """
+
+    :param ics_stack:
+    :param variable_dict:
+        dict, column: value. Select the rows matching all the values
+    :return:
+    """
+    if isinstance(ics_stack, seaice.core.corestack.CoreStack):
+        return ics_stack.select_profile(variable_dict)
+    mask = _profile_mask(ics_stack, variable_dict)
+    if mask is None:
+        return ics_stack
+    return ics_stack.loc[mask]
 
 
 def delete_profile(ics_stack, variable_dict):
     """
     :param ics_stack:
     :param variable_dict:
+        dict, column: value. Delete the rows matching all the values
     :return:
     """
-    str_select = '('
-    ii_var = []
-    ii = 0
-    for ii_key in variable_dict.keys():
-        if ii_key in ics_stack.columns.values:
-            ii_var.append(variable_dict[ii_key])
-            str_select = str_select + 'ics_stack.' + ii_key + '!=ii_var[' + str('%d' % ii) + ']) | ('
-            ii += 1
-    str_select = str_select[:-4]
-    return ics_stack.loc[eval(str_select)]
+    if isinstance(ics_stack, seaice.core.corestack.CoreStack):
+        return ics_stack.delete_profile(variable_dict)
+    mask = _profile_mask(ics_stack, variable_dict)
+    if mask is None:
+        return ics_stack
+    return ics_stack.loc[~mask]
 
 
 # s_nan is deprecated function
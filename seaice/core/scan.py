@@ -0,0 +1,186 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.scan.py : metadata scan of ice core spreadsheet, reading the summary sheet without parsing the profiles
+
+"""
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import seaice
+from seaice.core.schema import get_plan, to_float
+from seaice.core.sheet import SheetBlock, read_block
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to list the metadata of ice core spreadsheet without reading the profiles"
+__CoreVersion__ = 1.1
+
+__all__ = ["scan_ic_path", "scan_ic_list", "scan_ic_dir"]
+
+# sheets of the ice core spreadsheet which do not hold profile
+NOT_VARIABLE_SHEETS = ['summary', 'abreviation', 'locations', 'lists', 'Vf_oil_calculation']
+
+SCAN_COLUMNS = ['name', 'date', 'origin', 'lat', 'lon', 'ice_thickness', 'freeboard', 'snow_depth', 'collection',
+                'sheets', 'variables', 'version', 'path']
+
+
+def _mean_value(values):
+    """
+    Single value of a summary field measured one or several times, as in the CoreStack
+    """
+    if values.__len__() == 1 and isinstance(values[0], (int, float)):
+        return values[0]
+    return np.nanmean(values)
+
+
+def _data_variables(wb, sheets):
+    """
+    Variables holding at least one numeric value in the data rows of their sheet, as import_ic_path would import
+
+    :param wb:
+        openpyxl.workbook, XlsxWorkbook or MemoryWorkbook, spreadsheet of the current version
+    :param sheets:
+        list of string, variable sheets of the spreadsheet
+    :return:
+        list of string, sorted variables
+    """
+    plan = get_plan(__CoreVersion__)
+    variables = []
+    for sheet in sheets:
+        variable_plans = [plan.variables[variable] for variable in plan.sheets.get(sheet, ())]
+        if not variable_plans:
+            continue
+        data_block = read_block(wb[sheet], max_col=max([variable_plan.max_col for variable_plan in variable_plans]))
+        data_block = data_block[plan.row_data_start - 1:]
+        for variable_plan in variable_plans:
+            if (~np.isnan(to_float(data_block[:, variable_plan.value_columns[0]], variable_plan.dtype))).any():
+                variables.append(variable_plan.variable)
+    return sorted(variables)
+
+
+def scan_ic_path(ic_path, backend='xml', variables=False):
+    """
+    Read the metadata of an ice core spreadsheet: summary sheet cells and list of variable sheets. The spreadsheet is
+    never modified; the summary sheet of version 1.0 spreadsheet is read as if updated to the current version.
+
+    :param ic_path:
+        string, path to the xlsx ice core spreadsheet
+    :param backend:
+        'openpyxl' or 'xml', default 'xml'. Spreadsheet reader, see import_ic_path
+    :param variables:
+        boolean, default False. If True, the variable sheets are read as well to list the variables holding data,
+        without parsing the profiles. Otherwise, only the summary sheet is read and variables is None.
+    :return:
+        dict, metadata of the core, see SCAN_COLUMNS
+    """
+    logger = logging.getLogger(__name__)
+
+    wb = seaice.core.load_workbook(ic_path, backend=backend)
+    ws_summary = SheetBlock.from_worksheet(wb['summary'])
+    sheets = [sheet for sheet in wb.sheetnames
+              if sheet not in NOT_VARIABLE_SHEETS and sheet.lower().find('fig') == -1]
+
+    version = ws_summary['C3'].value
+    if not isinstance(version, (float, int)):
+        logger.error("(%s) ice core spreadsheet version not unavailable" % ic_path.split('/')[-1])
+    elif version < __CoreVersion__:
+        # read the summary sheet as updated in memory, as import_ic_path does
+        wb, _ = seaice.core.migrate_workbook(wb)
+        ws_summary = SheetBlock.from_worksheet(wb['summary'])
+    data_variables = _data_variables(wb, sheets) if variables else None
+    wb.close()
+
+    core = seaice.core.read_summary(ws_summary)
+    return {'name': core.name, 'date': core.date, 'origin': core.origin, 'lat': core.lat, 'lon': core.lon,
+            'ice_thickness': _mean_value(core.ice_thickness), 'freeboard': _mean_value(core.freeboard),
+            'snow_depth': _mean_value(core.snow_depth), 'collection': ', '.join(core.collection),
+            'sheets': ', '.join(sheets),
+            'variables': ', '.join(data_variables) if data_variables is not None else None, 'version': version,
+            'path': ic_path}
+
+
+def _scan_ic_path_worker(args):
+    """
+    Scan an ice core spreadsheet in a worker process. Errors are returned instead of raised, so that a corrupted file
+    does not stop the scan.
+
+    :param args:
+        tuple (ic_path, backend, variables)
+    :return:
+        tuple (ic_path, dict or None, error message or None)
+    """
+    ic_path, backend, variables = args
+    try:
+        return ic_path, scan_ic_path(ic_path, backend=backend, variables=variables), None
+    except Exception as e:
+        return ic_path, None, '%s: %s' % (type(e).__name__, e)
+
+
+def scan_ic_list(ic_list, n_workers=None, backend='xml', variables=False):
+    """
+    Scan the metadata of a list of ice core spreadsheet, see scan_ic_path
+
+    :param ic_list:
+        array, absolute filepath of the cores
+    :param n_workers:
+        int or None, default None. Number of worker processes. If None, use all available cpu.
+    :param backend:
+        'openpyxl' or 'xml', default 'xml'. Spreadsheet reader
+    :param variables:
+        boolean, default False. If True, list the variables holding data, see scan_ic_path
+    :return:
+        pd.DataFrame, one row per core with columns SCAN_COLUMNS, in the order of ic_list. Files which cannot be read
+        are logged and skipped.
+    """
+    logger = logging.getLogger(__name__)
+
+    ic_paths = []
+    for ic_path in ic_list:
+        if not os.path.exists(ic_path):
+            logger.warning("%s does not exists in core directory" % ic_path.split('/')[-1])
+        else:
+            ic_paths.append(ic_path)
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = min(n_workers, ic_paths.__len__())
+
+    args = [(ic_path, backend, variables) for ic_path in ic_paths]
+    if n_workers <= 1:
+        results = map(_scan_ic_path_worker, args)
+    else:
+        logger.info("Scanning %i ice cores with %i worker processes" % (ic_paths.__len__(), n_workers))
+        with multiprocessing.Pool(n_workers) as pool:
+            results = pool.map(_scan_ic_path_worker, args, chunksize=max(1, ic_paths.__len__() // (4 * n_workers)))
+
+    rows = []
+    for ic_path, row, error in results:
+        if error is not None:
+            logger.error("%s could not be scanned (%s)" % (ic_path.split('/')[-1], error))
+        else:
+            rows.append(row)
+    return pd.DataFrame(rows, columns=SCAN_COLUMNS)
+
+
+def scan_ic_dir(dirpath, fileext='.xlsx', n_workers=None, backend='xml'):
+    """
+    Scan the metadata of all ice core spreadsheet of a directory, see scan_ic_path
+
+    :param dirpath:
+        string, directory containing the ice core files
+    :param fileext:
+        string, default '.xlsx'. Extension of the ice core files
+    :return:
+        pd.DataFrame, one row per core, sorted by file path
+    """
+    return scan_ic_list(sorted(seaice.core.list_ic_path(dirpath, fileext)), n_workers=n_workers, backend=backend)
@@ -0,0 +1,269 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.schema.py : extraction plan of the variables of the ice core spreadsheet, compiled once per version
+
+"""
+import collections
+import types
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "the layout of the variable sheets for each ice core spreadsheet version"
+__CoreVersion__ = 1.1
+
+__all__ = ["ExtractionPlan", "VariablePlan", "register_plan", "get_plan", "variable_sheets", "typed_profile",
+           "concat_profiles"]
+
+# variable: (sheet, depth columns, value columns, comment column)
+# 3 depth columns (y_low, y_sup, y_mid) for a step profile, 1 depth column (y_mid) for a continuous profile
+VARIABLE_COLUMNS = collections.OrderedDict([
+    ('temperature', ('T_ice', 'A', 'B', 'C')),
+    ('salinity', ('S_ice', 'ABC', 'D', 'J')),
+    ('conductivity', ('S_ice', 'ABC', 'EF', 'J')),
+    ('specific conductance', ('S_ice', 'ABC', 'G', 'J')),
+    ('d18O', ('S_ice', 'ABC', 'H', 'J')),
+    ('dD', ('S_ice', 'ABC', 'I', 'J')),
+    ('oil weight fraction', ('Vf_oil', 'ABC', 'G', 'H')),
+    ('oil volume fraction', ('Vf_oil', 'ABC', 'F', 'H')),
+    ('oil content', ('oil_content', 'ABC', 'DEFGH', 'I')),
+    ('oil mass', ('Vf_oil', 'ABC', 'ED', 'H'))
+    # ('seawater', ('seawater', 'ABC', 'D', 'E')),
+    # ('sediment', ('sediment', 'ABC', 'D', 'E')),
+    # ('Chla', ('algal_pigment', 'ABC', 'D', 'E')),
+    # ('Phae', ('algal_pigment', 'ABC', 'D', 'E'))
+])
+
+# variable names refering to a sheet, without extraction plan
+SHEET_ALIASES = {'Vf_oil': 'Vf_oil',  # MOSIDEO project
+                 'Wf_oil': 'Wf_oil',  # MOSIDEO project
+                 'm_oil': 'Vf_oil'}
+
+STEP_COLUMNS = ['y_low', 'y_sup', 'y_mid']
+CONTINUOUS_COLUMNS = ['y_mid']
+
+# profile columns holding the same string on every row of a variable profile, stored as categorical. v_ref and variable
+# have fixed categories, so that profiles of different cores share the same categories.
+CATEGORICAL_COLUMNS = ['note', 'v_ref', 'variable', 'name']
+CATEGORICAL_DTYPES = {'v_ref': pd.CategoricalDtype(['top', 'bottom']),
+                      'variable': pd.CategoricalDtype(list(VARIABLE_COLUMNS))}
+# profile columns neither numeric nor categorical
+OBJECT_COLUMNS = ['comment']
+
+VariablePlan = collections.namedtuple('VariablePlan', ['variable', 'sheet', 'kind', 'depth_columns', 'depth_names',
+                                                       'value_columns', 'value_names', 'comment_column', 'dtype',
+                                                       'max_col'])
+VariablePlan.__doc__ = """
+VariablePlan, location of a variable in its sheet. Column indices start at 0. A value name None is read from the header
+row of the sheet.
+"""
+
+ExtractionPlan = collections.namedtuple('ExtractionPlan', ['version', 'row_data_start', 'header_row', 'header_cells',
+                                                           'variables', 'sheets'])
+ExtractionPlan.__doc__ = """
+ExtractionPlan, layout of the variable sheets of a spreadsheet version. Row indices start at 0: header_row is the row of
+the value names and header_cells gives the (row, column) of the core name, length, note and vertical reference.
+variables maps each variable to its VariablePlan and sheets each sheet to its variables.
+"""
+
+_PLANS = {}
+
+
+def _column_indices(columns):
+    return tuple(openpyxl.utils.column_index_from_string(col) - 1 for col in columns)
+
+
+def register_plan(version, row_data_start, header_cells, fixed_name=False, variable_columns=VARIABLE_COLUMNS,
+                  dtype='float64'):
+    """
+    Compile and register the extraction plan of a spreadsheet version
+
+    :param version:
+        float, spreadsheet version
+    :param row_data_start:
+        int, first row of data in the variable sheets, starting at 1
+    :param header_cells:
+        dict, 'name', 'length', 'note', 'v_ref': cell coordinate in the variable sheets, e.g. 'C1'. None if the cell
+        does not exist in this version.
+    :param fixed_name:
+        boolean, default False. If True, the first value column is named after the variable instead of being read in
+        the header row
+    :param variable_columns:
+        dict, variable: (sheet, depth columns, value columns, comment column), with column letters
+    :param dtype:
+        string, default 'float64'. Type of the depth and value columns, e.g. 'float32' to halve their memory
+    :return:
+        ExtractionPlan
+    """
+    header = {}
+    for key, coordinate in header_cells.items():
+        if coordinate is None:
+            header[key] = None
+        else:
+            col, row = openpyxl.utils.cell.coordinate_from_string(coordinate)
+            header[key] = (row - 1, openpyxl.utils.column_index_from_string(col) - 1)
+
+    variables = collections.OrderedDict()
+    sheets = collections.OrderedDict()
+    for variable, (sheet, depth, values, comment) in variable_columns.items():
+        depth_columns = _column_indices(depth)
+        value_columns = _column_indices(values)
+        comment_column = _column_indices(comment)[0]
+        value_names = [None] * value_columns.__len__()
+        if fixed_name:
+            value_names[0] = variable
+        variables[variable] = VariablePlan(
+            variable=variable, sheet=sheet, kind='step' if depth_columns.__len__() == 3 else 'continuous',
+            depth_columns=depth_columns,
+            depth_names=tuple(STEP_COLUMNS if depth_columns.__len__() == 3 else CONTINUOUS_COLUMNS),
+            value_columns=value_columns, value_names=tuple(value_names), comment_column=comment_column,
+            dtype=dtype, max_col=max(depth_columns + value_columns + (comment_column,)) + 1)
+        sheets[sheet] = sheets.get(sheet, ()) + (variable,)
+
+    plan = ExtractionPlan(version=version, row_data_start=row_data_start, header_row=row_data_start - 4,
+                          header_cells=types.MappingProxyType(header),
+                          variables=types.MappingProxyType(variables), sheets=types.MappingProxyType(sheets))
+    _PLANS[version] = plan
+    return plan
+
+
+def get_plan(version):
+    """
+    :param version:
+        float, spreadsheet version
+    :return:
+        ExtractionPlan, or None if no plan is registered for the version
+    """
+    return _PLANS.get(version)
+
+
+def variable_sheets(version=__CoreVersion__):
+    """
+    :param version:
+        float, spreadsheet version
+    :return:
+        dict, variable: sheet, including the sheet aliases
+    """
+    variable_2_sheet = {variable: variable_plan.sheet for variable, variable_plan in get_plan(version).variables.items()}
+    variable_2_sheet.update(SHEET_ALIASES)
+    return variable_2_sheet
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def to_float(values, dtype='float64'):
+    """
+    :param values:
+        array-like, cell values
+    :param dtype:
+        string, default 'float64'. Float type
+    :return:
+        np.array of dtype, values not numeric being nan
+    """
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').values.astype(dtype)
+
+
+def constant_categorical(value, n, column=None):
+    """
+    :param value:
+        string, value repeated on the n rows; None for missing values
+    :param n:
+        int, number of rows
+    :param column:
+        string, default None. Profile column, to use its fixed categories (see CATEGORICAL_DTYPES)
+    :return:
+        pd.Categorical
+    """
+    dtype = CATEGORICAL_DTYPES.get(column)
+    if dtype is None or not (_is_missing(value) or value in dtype.categories):
+        dtype = pd.CategoricalDtype(pd.Index([] if _is_missing(value) else [value], dtype=object))
+    code = -1 if _is_missing(value) else dtype.categories.get_loc(value)
+    return pd.Categorical.from_codes(np.full(n, code, dtype=np.int8), dtype=dtype)
+
+
+def typed_profile(profile, dtype='float64'):
+    """
+    Convert the columns of a profile to their type: CATEGORICAL_COLUMNS to categorical, OBJECT_COLUMNS unchanged and
+    all other columns (depths, values and length) to float
+
+    :param profile:
+        pd.DataFrame, profile of a core
+    :param dtype:
+        string, default 'float64'. Type of the float columns
+    :return:
+        pd.DataFrame
+    """
+    profile = profile.copy()
+    for column in profile.columns:
+        if column in CATEGORICAL_COLUMNS:
+            if not isinstance(profile[column].dtype, pd.CategoricalDtype):
+                values = [None if _is_missing(value) else value for value in profile[column]]
+                categories = pd.unique(np.array([value for value in values if value is not None] + [None],
+                                                dtype=object)[:-1])
+                dtype_column = CATEGORICAL_DTYPES.get(column)
+                if dtype_column is None or not set(categories) <= set(dtype_column.categories):
+                    dtype_column = pd.CategoricalDtype(pd.Index(categories, dtype=object))
+                profile[column] = pd.Categorical(values, dtype=dtype_column)
+        elif column not in OBJECT_COLUMNS:
+            profile[column] = to_float(profile[column].values, dtype)
+    return profile
+
+
+def concat_profiles(profiles, **kwargs):
+    """
+    Concatenate profiles with pd.concat, keeping the categorical columns categorical: pd.concat turns categorical columns
+    with different categories to object, they are converted back to the union of the categories.
+
+    :param profiles:
+        list of pd.DataFrame. Empty frames without columns are ignored
+    :param kwargs:
+        keyword arguments passed to pd.concat, e.g. sort
+    :return:
+        pd.DataFrame
+    """
+    profiles = [profile for profile in profiles if not (profile.empty and profile.columns.size == 0)]
+    if not profiles:
+        return pd.DataFrame()
+    if profiles.__len__() == 1:
+        return pd.concat(profiles, **kwargs)
+
+    profile_dtypes = [profile.dtypes.to_dict() for profile in profiles]
+    columns = []
+    for dtypes in profile_dtypes:
+        columns += [column for column, dtype in dtypes.items() if column not in columns and
+                    isinstance(dtype, pd.CategoricalDtype)]
+    unified = {}
+    for column in columns:
+        dtypes = [_dtypes[column] for _dtypes in profile_dtypes if column in _dtypes]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) or \
+                (dtypes.__len__() == profiles.__len__() and all(dtype == dtypes[0] for dtype in dtypes)):
+            continue
+        # union of the categories, in order of appearance
+        categories = dict.fromkeys(c for dtype in dtypes for c in dtype.categories)
+        unified[column] = pd.CategoricalDtype(pd.Index(list(categories), dtype=dtypes[0].categories.dtype))
+
+    # columns with different categories, or missing in some profiles, are concatenated as object and converted once
+    profile = pd.concat(profiles, **kwargs)
+    for column, dtype in unified.items():
+        profile[column] = profile[column].astype(dtype)
+    return profile
+
+
+register_plan(1, row_data_start=6, header_cells={'name': 'C1', 'length': 'C2', 'note': 'C3', 'v_ref': None},
+              fixed_name=True)
+register_plan(1.1, row_data_start=8, header_cells={'name': 'C1', 'length': 'C2', 'note': 'C3', 'v_ref': 'C4'})
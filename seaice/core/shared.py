@@ -0,0 +1,233 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.shared.py : handoff of a CoreStack to worker processes through shared memory
+
+The columns of the stack are copied once in a shared memory block. Numeric and datetime columns are stored as is, string
+(object) and categorical columns as integer codes, their categories being sent with the handle. The handle is small and
+cheap to pickle; workers attach a read-only view of the stack without copying the data.
+
+USAGE:
+    with seaice.core.shared.share_stack(ics_stack) as shared:
+        with multiprocessing.Pool(4) as pool:
+            results = pool.map(worker, [(shared, variable) for variable in variables])
+
+    def worker(args):
+        shared, variable = args
+        ics_stack = shared.attach()
+        ...
+
+String columns of the attached stack are categoricals; missing values (None or nan) of these columns are nan.
+"""
+import logging
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from seaice.core.corestack import CoreStack
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "classes to share a CoreStack with worker processes without pickling the data"
+__CoreVersion__ = 1.1
+
+__all__ = ["SharedStack", "share_stack", "attach_stack"]
+
+# column offsets in the shared memory block are aligned on ALIGN bytes
+ALIGN = 64
+
+
+def _codes_dtype(n_categories):
+    """
+    Smallest signed integer type holding the codes of n_categories, -1 being the missing value
+    """
+    for dtype in [np.int8, np.int16, np.int32]:
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode(values):
+    """
+    Encode a column as a numpy array to store in shared memory
+
+    :param values:
+        pd.Series
+    :return:
+        tuple (np.ndarray, kind, extra). kind is 'array', 'datetimetz' or 'codes'; extra is the time zone of
+        'datetimetz' columns and the categories of 'codes' columns.
+    """
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        return np.ascontiguousarray(values.values), 'array', None
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return np.ascontiguousarray(values.array.asi8), 'datetimetz', str(dtype.tz)
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        codes = values.cat.codes.values
+    else:
+        codes, categories = pd.factorize(values.values)
+        categories = pd.Index(categories, dtype=object)
+    return codes.astype(_codes_dtype(categories.__len__())), 'codes', categories
+
+
+def _decode(array, kind, extra):
+    """
+    Column of the attached stack, viewing array
+    """
+    if kind == 'datetimetz':
+        return pd.arrays.DatetimeArray(array.view('M8[ns]'), dtype=pd.DatetimeTZDtype(tz=extra))
+    if kind == 'codes':
+        return pd.Categorical.from_codes(array, categories=extra)
+    return array
+
+
+class SharedStack:
+    """
+    SharedStack, handle of a CoreStack copied in shared memory. The handle can be pickled and sent to worker processes,
+    which attach a read-only view of the stack with attach().
+
+    The process creating the handle owns the shared memory block and must release it with unlink() once the workers
+    are done, or use the handle as a context manager.
+    """
+
+    def __init__(self, name, size, columns, index, owner=False):
+        """
+        :param name:
+            string, name of the shared memory block
+        :param size:
+            int, size of the shared memory block, in bytes
+        :param columns:
+            list of tuple (column, kind, dtype, offset, length, extra), layout of the columns in the block
+        :param index:
+            tuple ('range', start, stop, step) or (kind, dtype, offset, length, extra), layout of the index
+        :param owner:
+            boolean, default False. True for the handle of the process which created the block
+        """
+        self.name = name
+        self.size = size
+        self.columns = columns
+        self.index = index
+        self.owner = owner
+        self._shm = None
+
+    def __getstate__(self):
+        # only the layout is sent to the worker processes
+        d = self.__dict__.copy()
+        d['_shm'] = None
+        d['owner'] = False
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.owner:
+            self.unlink()
+        self.close()
+
+    def _array(self, dtype, offset, length):
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        array = np.ndarray((length,), dtype=np.dtype(dtype), buffer=self._shm.buf, offset=offset)
+        array.setflags(write=False)
+        return array
+
+    def attach(self):
+        """
+        :return:
+            CoreStack, read-only view of the shared stack. The stack must be deleted before closing the handle.
+        """
+        data = {}
+        for column, kind, dtype, offset, length, extra in self.columns:
+            data[column] = _decode(self._array(dtype, offset, length), kind, extra)
+        if self.index[0] == 'range':
+            index = pd.RangeIndex(*self.index[1:])
+        else:
+            kind, dtype, offset, length, extra = self.index
+            index = pd.Index(_decode(self._array(dtype, offset, length), kind, extra), copy=False)
+        return CoreStack(data, index=index, columns=[column[0] for column in self.columns], copy=False)
+
+    def close(self):
+        """
+        Close the access to the shared memory block of this process
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        """
+        Release the shared memory block. Only the owner of the block should unlink it, once all workers are done.
+        """
+        logger = logging.getLogger(__name__)
+
+        if not self.owner:
+            logger.warning("shared stack %s is unlinked by a process which does not own it" % self.name)
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        self._shm.unlink()
+
+
+def share_stack(ics_stack):
+    """
+    Copy a CoreStack in a shared memory block
+
+    :param ics_stack:
+        CoreStack or pd.DataFrame
+    :return:
+        SharedStack, handle owning the shared memory block
+    """
+    logger = logging.getLogger(__name__)
+
+    arrays = []
+    columns = []
+    offset = 0
+
+    def layout(values):
+        nonlocal offset
+        array, kind, extra = _encode(values)
+        arrays.append((offset, array))
+        item = (kind, array.dtype.str, offset, array.__len__(), extra)
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+        return item
+
+    if not ics_stack.columns.is_unique:
+        logger.error("columns of the stack are not unique, they cannot be shared")
+        return None
+    for column in ics_stack.columns:
+        columns.append((column,) + layout(ics_stack[column]))
+    if isinstance(ics_stack.index, pd.RangeIndex):
+        index = ('range', ics_stack.index.start, ics_stack.index.stop, ics_stack.index.step)
+    else:
+        index = layout(ics_stack.index.to_series())
+
+    # a shared memory block cannot be empty
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for array_offset, array in arrays:
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=array_offset)
+        target[:] = array
+        del target
+    shared = SharedStack(shm.name, shm.size, columns, index, owner=True)
+    shared._shm = shm
+    logger.info("CoreStack of %i rows shared in %s (%.1f MB)" % (ics_stack.__len__(), shm.name, offset / 1e6))
+    return shared
+
+
+def attach_stack(shared):
+    """
+    :param shared:
+        SharedStack
+    :return:
+        CoreStack, read-only view of the shared stack
+    """
+    return shared.attach()
@@ -0,0 +1,298 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.sheet.py : in-memory worksheet read in a single pass from an ice core spreadsheet
+
+"""
+import numpy as np
+import openpyxl
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to read worksheet values in block"
+__CoreVersion__ = 1.1
+
+__all__ = ["SheetBlock", "EditableSheet", "MemoryWorkbook", "read_block"]
+
+
+def read_block(ws, max_col=None, min_row=1):
+    """
+    Read the cell values of a worksheet in a single pass, from min_row to the last row of the worksheet
+
+    :param ws:
+        openpyxl.worksheet, in normal or read-only mode
+    :param max_col:
+        int, number of columns to read, starting with column A. If None, read all columns
+    :param min_row:
+        int, default 1. First row to read
+    :return:
+        np.array, 2-D array of object with one row per worksheet row. Trailing empty rows are dropped
+    """
+    if isinstance(ws, openpyxl.worksheet._read_only.ReadOnlyWorksheet):
+        # the dimension declared by the file may be missing or wrong, read the rows up to the end of the sheet
+        ws.reset_dimensions()
+    rows = [tuple(row) for row in ws.iter_rows(min_row=min_row, max_col=max_col, values_only=True)]
+    # worksheet may end with formatted but empty rows
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    if max_col is None:
+        max_col = max([0] + [row.__len__() for row in rows])
+
+    block = np.empty((rows.__len__(), max_col), dtype=object)
+    for ii_row, row in enumerate(rows):
+        block[ii_row, :] = row[:max_col] + (None,) * (max_col - row.__len__())
+    return block
+
+
+class Cell:
+    """
+    Cell, value holder returned by SheetBlock
+    """
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+
+class SheetBlock:
+    """
+    SheetBlock, read-only worksheet holding the cell values in a 2-D array.
+
+    SheetBlock mimics the subset of the openpyxl worksheet interface used to read ice core spreadsheet: ws['C21'].value,
+    ws.cell(row=, column=).value, ws.iter_rows(..., values_only=True), ws.title, ws.max_row and ws.max_column
+    """
+
+    def __init__(self, values, title=None):
+        """
+        :param values:
+            np.array, 2-D array of cell values, values[0, 0] is cell A1
+        :param title:
+            string, name of the worksheet
+        """
+        self.values = values
+        self.title = title
+
+    @classmethod
+    def from_worksheet(cls, ws, max_col=None):
+        """
+        :param ws:
+            openpyxl.worksheet
+        :param max_col:
+            int, number of columns to read. If None, read all columns
+        :return:
+            SheetBlock
+        """
+        return cls(read_block(ws, max_col=max_col), title=ws.title)
+
+    @property
+    def max_row(self):
+        return self.values.shape[0]
+
+    @property
+    def max_column(self):
+        return self.values.shape[1]
+
+    def cell(self, row, column):
+        """
+        :param row:
+            int, row index, starting at 1
+        :param column:
+            int, column index, starting at 1
+        :return:
+            Cell
+        """
+        if 0 < row <= self.values.shape[0] and 0 < column <= self.values.shape[1]:
+            return Cell(self.values[row - 1, column - 1])
+        return Cell(None)
+
+    def __getitem__(self, coordinate):
+        col, row = openpyxl.utils.cell.coordinate_from_string(coordinate)
+        return self.cell(row=row, column=openpyxl.utils.column_index_from_string(col))
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None, values_only=True):
+        """
+        :param min_row:
+        :param max_row:
+        :param min_col:
+        :param max_col:
+        :param values_only:
+            boolean, default True. If False, yield tuple of Cell
+        :return:
+            generator of tuple
+        """
+        if max_row is None:
+            max_row = self.max_row
+        if max_col is None:
+            max_col = self.max_column
+        for row in range(min_row, max_row + 1):
+            values = tuple(self.values[row - 1, min_col - 1:max_col]) if row <= self.max_row else ()
+            values += (None,) * (max_col - min_col + 1 - values.__len__())
+            if values_only:
+                yield values
+            else:
+                yield tuple(Cell(value) for value in values)
+
+
+class EditableCell:
+    """
+    EditableCell, cell of an EditableSheet. Assigning the value writes it to the sheet.
+    """
+    __slots__ = ['sheet', 'row', 'column']
+
+    def __init__(self, sheet, row, column):
+        self.sheet = sheet
+        self.row = row
+        self.column = column
+
+    @property
+    def value(self):
+        return self.sheet._cells.get((self.row, self.column))
+
+    @value.setter
+    def value(self, value):
+        self.sheet._cells[(self.row, self.column)] = value
+
+
+class EditableSheet:
+    """
+    EditableSheet, in-memory worksheet supporting the cell assignment used to update ice core spreadsheet.
+
+    As in an openpyxl worksheet, a cell exists once accessed and max_row, max_column include the accessed cells, so
+    that add_row, delete_row, delete_column and move_column behave the same on an EditableSheet and on an openpyxl
+    worksheet.
+    """
+
+    def __init__(self, values, title=None):
+        """
+        :param values:
+            np.array, 2-D array of cell values, values[0, 0] is cell A1
+        :param title:
+            string, name of the worksheet
+        """
+        self._cells = {(ii_row + 1, ii_col + 1): value for (ii_row, ii_col), value in np.ndenumerate(values)
+                       if value is not None}
+        self.title = title
+
+    @classmethod
+    def from_worksheet(cls, ws):
+        """
+        :param ws:
+            openpyxl.worksheet or SheetBlock
+        :return:
+            EditableSheet
+        """
+        return cls(read_block(ws), title=ws.title)
+
+    @property
+    def min_row(self):
+        return min([row for row, col in self._cells] or [1])
+
+    @property
+    def max_row(self):
+        return max([row for row, col in self._cells] or [1])
+
+    @property
+    def max_column(self):
+        return max([col for row, col in self._cells] or [1])
+
+    def cell(self, row, column, value=None):
+        """
+        :param row:
+            int, row index, starting at 1
+        :param column:
+            int, column index, starting at 1
+        :param value:
+            default None. If defined, value assigned to the cell
+        :return:
+            EditableCell
+        """
+        if value is not None:
+            self._cells[(row, column)] = value
+        else:
+            self._cells.setdefault((row, column), None)
+        return EditableCell(self, row, column)
+
+    def __getitem__(self, coordinate):
+        col, row = openpyxl.utils.cell.coordinate_from_string(coordinate)
+        return self.cell(row=row, column=openpyxl.utils.column_index_from_string(col))
+
+    def __setitem__(self, coordinate, value):
+        self[coordinate].value = value
+
+    def insert_rows(self, idx, amount=1):
+        """
+        Insert empty rows before row idx, as openpyxl worksheet.insert_rows
+        """
+        self._cells = {((row + amount, col) if row >= idx else (row, col)): value
+                       for (row, col), value in self._cells.items()}
+
+    def delete_rows(self, idx, amount=1):
+        """
+        Delete rows idx to idx + amount - 1, as openpyxl worksheet.delete_rows
+        """
+        self._cells = {((row - amount, col) if row >= idx + amount else (row, col)): value
+                       for (row, col), value in self._cells.items() if not idx <= row < idx + amount}
+
+    def move_range(self, cell_range, rows=0, cols=0):
+        """
+        Move a range of cells, as openpyxl worksheet.move_range: the destination cells are overwritten, including by
+        empty cells
+
+        :param cell_range:
+            string, range of cells, e.g. 'D4:K20'
+        :param rows:
+            int, number of rows to move the cells by, negative upward
+        :param cols:
+            int, number of columns to move the cells by, negative leftward
+        """
+        min_col, min_row, max_col, max_row = openpyxl.utils.cell.range_boundaries(cell_range)
+        moved = {}
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                moved[(row + rows, col + cols)] = self._cells.pop((row, col), None)
+        self._cells.update(moved)
+
+    def to_block(self):
+        """
+        :return:
+            SheetBlock, values of the sheet. Empty string are stored as None, as they are when saved by openpyxl.
+        """
+        values = np.empty((self.max_row, self.max_column), dtype=object)
+        for (row, col), value in self._cells.items():
+            if value != '':
+                values[row - 1, col - 1] = value
+        return SheetBlock(values, title=self.title)
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None, values_only=True):
+        return self.to_block().iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col,
+                                         values_only=values_only)
+
+
+class MemoryWorkbook:
+    """
+    MemoryWorkbook, in-memory copy of a read-only workbook. Worksheets are copied to EditableSheet on first access, so
+    that they can be modified without writing the spreadsheet.
+    """
+
+    def __init__(self, wb):
+        """
+        :param wb:
+            openpyxl.workbook or XlsxWorkbook, source workbook
+        """
+        self._wb = wb
+        self._sheets = {}
+        self.sheetnames = list(wb.sheetnames)
+
+    def __getitem__(self, name):
+        if name not in self._sheets:
+            self._sheets[name] = EditableSheet.from_worksheet(self._wb[name])
+        return self._sheets[name]
+
+    def close(self):
+        self._wb.close()
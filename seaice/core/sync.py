@@ -0,0 +1,211 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.sync.py : incremental synchronisation of a CoreStack with a directory of ice core spreadsheet
+
+"""
+import json
+import logging
+import os
+
+import seaice
+from seaice.core.cache import file_hash
+from seaice.core.collection import prune_collections
+from seaice.core.corestack import CoreStack, stack_cores
+from seaice.core.schema import concat_profiles
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to update a CoreStack with the modified ice core files of a directory"
+__CoreVersion__ = 1.1
+
+__all__ = ["sync_ic_dir", "scan_changes", "load_sync_state", "save_sync_state"]
+
+SYNC_STATE_VERSION = 2
+
+
+def load_sync_state(state_path):
+    """
+    :param state_path:
+        string, path to the json file holding the state of the previous synchronisation
+    :return:
+        dict, ice core file path: {'mtime', 'size', 'hash', 'name', 'collection'}. Empty if the file does not exist.
+        collection is the collection of the core as read from the spreadsheet, before removing the missing cores.
+    """
+    logger = logging.getLogger(__name__)
+
+    if state_path is None or not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        state = json.load(f)
+    if state.get('version') != SYNC_STATE_VERSION:
+        logger.warning("sync state %s has an unknown version, ignoring it" % state_path)
+        return {}
+    return state['files']
+
+
+def save_sync_state(state_path, files):
+    """
+    :param state_path:
+        string, path to the json file holding the state of the synchronisation
+    :param files:
+        dict, ice core file path: {'mtime', 'size', 'hash', 'name', 'collection'}
+    """
+    temp_path = state_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'version': SYNC_STATE_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+
+def scan_changes(ic_paths, state):
+    """
+    Compare a set of ice core files to the state of the previous synchronisation. Files with unchanged size and
+    modification time are not read; the content of the others is hashed to detect real changes.
+
+    :param ic_paths:
+        iterable of string, path of the ice core files
+    :param state:
+        dict, state of the previous synchronisation, as returned by load_sync_state
+    :return:
+        dict, {'added': list, 'modified': list, 'removed': list, 'unchanged': list} of file path, and 'files' the new
+        state entry of the files present.
+    """
+    changes = {'added': [], 'modified': [], 'removed': [], 'unchanged': [], 'files': {}}
+    for ic_path in sorted(ic_paths):
+        stat = os.stat(ic_path)
+        entry = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': None, 'name': None, 'collection': None}
+        previous = state.get(ic_path)
+        if previous is not None and previous['mtime'] == entry['mtime'] and previous['size'] == entry['size']:
+            changes['unchanged'].append(ic_path)
+            changes['files'][ic_path] = previous
+            continue
+
+        entry['hash'] = file_hash(ic_path)
+        if previous is None:
+            changes['added'].append(ic_path)
+        elif previous['hash'] == entry['hash']:
+            entry['name'] = previous['name']
+            entry['collection'] = previous.get('collection')
+            changes['unchanged'].append(ic_path)
+        else:
+            changes['modified'].append(ic_path)
+        changes['files'][ic_path] = entry
+
+    changes['removed'] = sorted([ic_path for ic_path in state if ic_path not in changes['files']])
+    return changes
+
+
+def _rebuild_collections(ics_stack, files):
+    """
+    Collection column of the stack, from the collection read from the spreadsheet of each core restricted to the cores
+    of the stack. The collection of a core is thus restored when a removed core comes back in the directory.
+
+    :param ics_stack:
+        CoreStack, with the columns name and collection
+    :param files:
+        dict, ice core file path: {'mtime', 'size', 'hash', 'name', 'collection'}
+    :return:
+        CoreStack, with the collection column rebuilt for the cores whose collection is known
+    """
+    names = set(ics_stack.name.unique())
+    collections = {entry['name']: ', '.join([core for core in entry['collection'] if core in names])
+                   for entry in files.values() if entry['name'] in names and entry.get('collection') is not None}
+    if not collections:
+        return ics_stack
+
+    ics_stack = ics_stack.copy()
+    rows = ics_stack.name.isin(list(collections)).values
+    # the rebuilt collections may not be in the categories of a categorical stack
+    collection = ics_stack['collection'].astype(object)
+    collection[rows] = ics_stack['name'][rows].astype(object).map(collections)
+    ics_stack['collection'] = collection
+    return CoreStack(ics_stack)
+
+
+def sync_ic_dir(dirpath, fileext='.xlsx', ics_stack=None, state_path=None, variables=None, v_ref='top',
+                **kwargs):
+    """
+    Synchronise a CoreStack with the ice core files of a directory. Only the files added or modified since the previous
+    synchronisation are imported; the cores of removed files are dropped from the stack.
+
+    :param dirpath:
+        string, directory containing the ice core files
+    :param fileext:
+        string, default '.xlsx'. Extension of the ice core files
+    :param ics_stack:
+        CoreStack, stack built by the previous synchronisation. If None, all the files are imported. A categorical
+        stack, see CoreStack.categorize, stays categorical.
+    :param state_path:
+        string, path to the json file holding the state of the synchronisation. Default is 'ic_sync.json' in dirpath
+    :param variables:
+        list of string, variables to import. If not defined, all variable will be imported.
+    :param v_ref:
+        'top' or 'bottom', vertical reference
+    :param kwargs:
+        keyword arguments passed to import_ic_path: n_workers, cache_dir, lazy, backend
+    :return:
+        tuple (CoreStack, dict). The updated stack and the changes: 'added', 'modified', 'removed' (core names),
+        'unchanged' (number of files) and 'stack', the CoreStack of the imported cores
+    """
+    logger = logging.getLogger(__name__)
+
+    if state_path is None:
+        state_path = os.path.join(os.path.realpath(dirpath), 'ic_sync.json')
+
+    state = load_sync_state(state_path)
+    if ics_stack is None:
+        # without a stack to update, every file has to be imported
+        state = {}
+        ics_stack = CoreStack()
+
+    changes = scan_changes(seaice.core.list_ic_path(dirpath, fileext), state)
+    logger.info("sync %s: %i added, %i modified, %i removed, %i unchanged files"
+                % (dirpath, changes['added'].__len__(), changes['modified'].__len__(),
+                   changes['removed'].__len__(), changes['unchanged'].__len__()))
+
+    # cores to drop from the stack: cores of removed and modified files
+    old_names = [state[ic_path]['name'] for ic_path in changes['removed'] + changes['modified']
+                 if state[ic_path]['name'] is not None]
+
+    # import added and modified files
+    ic_paths = changes['added'] + changes['modified']
+    n_workers = kwargs.pop('n_workers', 1)
+    ic_dict = {}
+    empty_names = []
+    for ic_path, ic_data in zip(ic_paths, seaice.core._map_ic_path(ic_paths, n_workers=n_workers,
+                                                                   variables=variables, v_ref=v_ref, **kwargs)):
+        changes['files'][ic_path]['name'] = ic_data.name
+        changes['files'][ic_path]['collection'] = sorted(ic_data.collection)
+        if not ic_data.pending_sheets() and ic_data.variables().size == 0:
+            empty_names.append(ic_data.name)
+            logger.warning("%s have no properties profile" % ic_data.name)
+        else:
+            ic_dict[ic_data.name] = ic_data
+
+    # cores removed from the directory, or without profile, are removed from the collection of the imported cores
+    prune_collections(ic_dict, [name for name in old_names + empty_names if name not in ic_dict])
+    delta_stack = stack_cores(ic_dict)
+
+    categorical = CoreStack(ics_stack).is_categorical()
+    if not ics_stack.empty:
+        ics_stack = ics_stack[~ics_stack.name.isin(old_names + list(ic_dict.keys()))]
+    ics_stack = CoreStack(concat_profiles([ics_stack, delta_stack], sort=False, ignore_index=True))
+    if not ics_stack.empty and 'collection' in ics_stack:
+        ics_stack = _rebuild_collections(ics_stack, changes['files'])
+    if categorical:
+        ics_stack = ics_stack.categorize()
+
+    save_sync_state(state_path, changes['files'])
+
+    delta = {'added': [changes['files'][ic_path]['name'] for ic_path in changes['added']],
+             'modified': [changes['files'][ic_path]['name'] for ic_path in changes['modified']],
+             'removed': [state[ic_path]['name'] for ic_path in changes['removed']],
+             'unchanged': changes['unchanged'].__len__(),
+             'stack': delta_stack}
+    return ics_stack, delta
@@ -0,0 +1,165 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.timing.py : wall time instrumentation of ice core import
+
+"""
+import contextlib
+import logging
+import time
+
+import pandas as pd
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "classes to record the time spent in each stage of the ice core import"
+__CoreVersion__ = 1.1
+
+__all__ = ["ImportTimer"]
+
+TIMING_COLUMNS = ['path', 'stage', 'sheet', 'time', 'rows']
+
+
+class StageRecord:
+    """
+    StageRecord, timing of a stage. rows can be set within the stage.
+    """
+    __slots__ = ['path', 'stage', 'sheet', 'time', 'rows']
+
+    def __init__(self, path, stage, sheet=None):
+        self.path = path
+        self.stage = stage
+        self.sheet = sheet
+        self.time = None
+        self.rows = None
+
+
+class ImportTimer:
+    """
+    ImportTimer, records the wall time and the row count of each stage of the ice core import, per file and per sheet.
+
+    USAGE:
+        timer = ImportTimer()
+        ic_dict = seaice.core.import_ic_list(ic_paths, timer=timer)
+        timer.table()
+        timer.summary(n=10)
+
+    Stages are 'total', 'cache', 'load_workbook', 'summary', 'migrate', 'read_summary', 'read_variable', 'to_numeric',
+    'add_profile', 'finalize' and 'save_cache'. 'to_numeric' is part of 'read_variable', every stage is part of 'total'.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.path = None
+
+    @contextlib.contextmanager
+    def file(self, path):
+        """
+        Set the file the following stages are recorded for
+        """
+        previous = self.path
+        self.path = path
+        try:
+            yield self
+        finally:
+            self.path = previous
+
+    @contextlib.contextmanager
+    def stage(self, stage, sheet=None):
+        """
+        Record the wall time of the enclosed block
+
+        :param stage:
+            string, stage name
+        :param sheet:
+            string, default None. Sheet name, for the stages reading a sheet
+        :return:
+            StageRecord, the row count can be set on it
+        """
+        record = StageRecord(self.path, stage, sheet)
+        t_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.time = time.perf_counter() - t_start
+            self.records.append(record)
+
+    def extend(self, records):
+        """
+        Add the records of another timer, e.g. of a worker process
+        """
+        self.records.extend(records)
+
+    def table(self):
+        """
+        :return:
+            pd.DataFrame, one row per stage record with columns path, stage, sheet, time (s) and rows
+        """
+        return pd.DataFrame([[getattr(r, c) for c in TIMING_COLUMNS] for r in self.records], columns=TIMING_COLUMNS)
+
+    def stage_table(self):
+        """
+        :return:
+            pd.DataFrame, time and row count summed per stage, with the number of records
+        """
+        table = self.table()
+        return table.groupby('stage', sort=False).agg(time=('time', 'sum'), rows=('rows', 'sum'),
+                                                      count=('time', 'size'))
+
+    def file_table(self):
+        """
+        :return:
+            pd.DataFrame, one row per file with the total time and the time of each stage
+        """
+        table = self.table()
+        return table.pivot_table(index='path', columns='stage', values='time', aggfunc='sum')
+
+    def slowest(self, n=10):
+        """
+        :param n:
+            int, default 10. Number of files
+        :return:
+            pd.DataFrame, the n slowest files, sorted by total time
+        """
+        file_table = self.file_table()
+        if 'total' not in file_table:
+            return file_table
+        return file_table.sort_values('total', ascending=False).head(n)
+
+    def summary(self, n=10):
+        """
+        Log the time spent per stage and the n slowest files
+        """
+        logger = logging.getLogger(__name__)
+
+        stage_table = self.stage_table()
+        logger.info("import time per stage:")
+        for stage, row in stage_table.iterrows():
+            logger.info("\t%s\t%.3f s\t(%i records, %i rows)" % (stage, row['time'], row['count'], row['rows']))
+        slowest = self.slowest(n)
+        if 'total' in slowest:
+            logger.info("%i slowest files:" % slowest.__len__())
+            for path, row in slowest.iterrows():
+                logger.info("\t%.3f s\t%s" % (row['total'], path))
+        return stage_table
+
+
+class NullTimer:
+    """
+    NullTimer, timer recording nothing, used when the import is not instrumented
+    """
+
+    def file(self, path):
+        return contextlib.nullcontext(self)
+
+    def stage(self, stage, sheet=None):
+        return contextlib.nullcontext(StageRecord(None, stage, sheet))
+
+
+NULL_TIMER = NullTimer()
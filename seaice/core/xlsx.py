@@ -0,0 +1,278 @@
+#! /usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+seaice.core.xlsx.py : streaming reader of xlsx spreadsheet, reading the sheet xml directly from the zip archive
+
+"""
+import logging
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+
+import numpy as np
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+from openpyxl.utils.datetime import from_excel, from_ISO8601, CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+from seaice.core.sheet import SheetBlock
+
+__author__ = "Marc Oggier"
+__license__ = "GPL"
+__version__ = "1.1"
+__maintainer__ = "Marc Oggier"
+__contact__ = "Marc Oggier"
+__email__ = "moggier@alaska.edu"
+__status__ = "dev"
+__date__ = "2026/10/17"
+__comment__ = "function to read xlsx spreadsheet without building openpyxl cell objects"
+__CoreVersion__ = 1.1
+
+__all__ = ["XlsxWorkbook"]
+
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def _cast_number(value):
+    """
+    Convert a number stored as string to an int or a float, as openpyxl does
+    """
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _string_content(element):
+    """
+    Text of a shared or inline string, stripped of rich text formatting and phonetic runs
+    """
+    snippets = []
+    for child in element:
+        if child.tag == NS_MAIN + 't':
+            snippets.append(child.text or '')
+        elif child.tag == NS_MAIN + 'r':
+            t = child.find(NS_MAIN + 't')
+            if t is not None:
+                snippets.append(t.text or '')
+    return ''.join(snippets).replace('x005F_', '')
+
+
+class XlsxWorkbook:
+    """
+    XlsxWorkbook, read-only xlsx workbook streaming the sheet xml out of the zip archive.
+
+    Cell values are decoded as openpyxl does in read-only mode (shared strings, numbers, booleans, dates and formulas).
+    Each worksheet is returned as a SheetBlock, holding its values in a 2-D numpy array.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename:
+            string or file-like object, xlsx spreadsheet
+        """
+        self._zf = zipfile.ZipFile(filename)
+        self._sheets = {}
+        self._shared_strings = None
+
+        workbook_path = self._office_document()
+        workbook_rels = self._read_rels(workbook_path)
+
+        root = ET.fromstring(self._zf.read(workbook_path))
+        pr = root.find(NS_MAIN + 'workbookPr')
+        if pr is not None and pr.get('date1904') in ('1', 'true'):
+            self.epoch = CALENDAR_MAC_1904
+        else:
+            self.epoch = CALENDAR_WINDOWS_1900
+
+        self._sheet_paths = {}
+        self.sheetnames = []
+        for sheet in root.iter(NS_MAIN + 'sheet'):
+            self.sheetnames.append(sheet.get('name'))
+            self._sheet_paths[sheet.get('name')] = workbook_rels[sheet.get(NS_REL + 'id')][1]
+
+        self._shared_strings_path = None
+        styles_path = None
+        for rel_type, target in workbook_rels.values():
+            if rel_type.endswith('/sharedStrings'):
+                self._shared_strings_path = target
+            elif rel_type.endswith('/styles'):
+                styles_path = target
+        self.date_formats, self.timedelta_formats = self._read_styles(styles_path)
+
+    def _office_document(self):
+        """
+        :return:
+            string, path of the workbook part in the archive
+        """
+        if '_rels/.rels' in self._zf.namelist():
+            root = ET.fromstring(self._zf.read('_rels/.rels'))
+            for rel in root.iter(NS_PKG_REL + 'Relationship'):
+                if rel.get('Type').endswith('/officeDocument'):
+                    return rel.get('Target').lstrip('/')
+        return 'xl/workbook.xml'
+
+    def _read_rels(self, part_path):
+        """
+        :param part_path:
+            string, path of the part in the archive
+        :return:
+            dict, relationship id: (type, path of the target in the archive)
+        """
+        folder, filename = posixpath.split(part_path)
+        rels_path = posixpath.join(folder, '_rels', filename + '.rels')
+        rels = {}
+        if rels_path not in self._zf.namelist():
+            return rels
+        root = ET.fromstring(self._zf.read(rels_path))
+        for rel in root.iter(NS_PKG_REL + 'Relationship'):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            rels[rel.get('Id')] = (rel.get('Type'), target)
+        return rels
+
+    def _read_styles(self, styles_path):
+        """
+        Index the cell styles refering to date and timedelta number formats
+        :param styles_path:
+            string, path of the styles part in the archive
+        :return:
+            tuple of set, (date styles, timedelta styles)
+        """
+        date_formats = set()
+        timedelta_formats = set()
+        if styles_path is None or styles_path not in self._zf.namelist():
+            return date_formats, timedelta_formats
+
+        root = ET.fromstring(self._zf.read(styles_path))
+        custom = {}
+        num_fmts = root.find(NS_MAIN + 'numFmts')
+        if num_fmts is not None:
+            for num_fmt in num_fmts:
+                custom[int(num_fmt.get('numFmtId'))] = num_fmt.get('formatCode')
+        cell_xfs = root.find(NS_MAIN + 'cellXfs')
+        if cell_xfs is not None:
+            for idx, xf in enumerate(cell_xfs):
+                num_fmt_id = int(xf.get('numFmtId', 0))
+                if num_fmt_id in custom:
+                    fmt = custom[num_fmt_id]
+                else:
+                    fmt = builtin_format_code(num_fmt_id)
+                if fmt is None:
+                    continue
+                if is_date_format(fmt):
+                    date_formats.add(idx)
+                if is_timedelta_format(fmt):
+                    timedelta_formats.add(idx)
+        return date_formats, timedelta_formats
+
+    @property
+    def shared_strings(self):
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if self._shared_strings_path is not None and self._shared_strings_path in self._zf.namelist():
+                with self._zf.open(self._shared_strings_path) as f:
+                    for _, element in ET.iterparse(f):
+                        if element.tag == NS_MAIN + 'si':
+                            self._shared_strings.append(_string_content(element))
+                            element.clear()
+        return self._shared_strings
+
+    def __getitem__(self, name):
+        if name not in self._sheet_paths:
+            raise KeyError("Worksheet %s does not exist." % name)
+        if name not in self._sheets:
+            self._sheets[name] = SheetBlock(self._read_sheet(self._sheet_paths[name]), title=name)
+        return self._sheets[name]
+
+    def close(self):
+        self._zf.close()
+
+    def _read_sheet(self, sheet_path):
+        """
+        Stream the sheet xml and decode the cell values
+        :param sheet_path:
+            string, path of the worksheet part in the archive
+        :return:
+            np.array, 2-D array of object, trailing empty rows are dropped
+        """
+        logger = logging.getLogger(__name__)
+
+        cells = {}
+        shared_formulae = {}
+        n_row = 0
+        n_col = 0
+        row_counter = 0
+        with self._zf.open(sheet_path) as f:
+            for _, element in ET.iterparse(f):
+                if element.tag != NS_MAIN + 'row':
+                    continue
+                row_counter = int(float(element.get('r'))) if element.get('r') else row_counter + 1
+                col_counter = 0
+                for c in element.iter(NS_MAIN + 'c'):
+                    coordinate = c.get('r')
+                    if coordinate:
+                        col_letter, row = coordinate_from_string(coordinate)
+                        col_counter = column_index_from_string(col_letter)
+                    else:
+                        row = row_counter
+                        col_counter += 1
+
+                    value = self._cell_value(c, shared_formulae)
+                    if value is not None:
+                        cells[(row, col_counter)] = value
+                        n_row = max(n_row, row)
+                        n_col = max(n_col, col_counter)
+                element.clear()
+
+        values = np.empty((n_row, n_col), dtype=object)
+        for (row, col), value in cells.items():
+            values[row - 1, col - 1] = value
+        logger.debug("%s read with %i rows and %i columns" % (sheet_path, n_row, n_col))
+        return values
+
+    def _cell_value(self, c, shared_formulae):
+        """
+        Decode the value of a cell element, following openpyxl read-only worksheet without data_only
+        """
+        data_type = c.get('t', 'n')
+        style_id = int(c.get('s', 0))
+
+        formula = c.find(NS_MAIN + 'f')
+        if formula is not None:
+            value = '='
+            if formula.text is not None:
+                value += formula.text
+            if formula.get('t') == 'shared':
+                idx = formula.get('si')
+                if idx in shared_formulae:
+                    value = shared_formulae[idx].translate_formula(c.get('r'))
+                elif value != '=':
+                    shared_formulae[idx] = Translator(value, c.get('r'))
+            return value
+
+        if data_type == 'inlineStr':
+            child = c.find(NS_MAIN + 'is')
+            return _string_content(child) if child is not None else None
+
+        value = c.findtext(NS_MAIN + 'v', None) or None
+        if value is None:
+            return None
+        if data_type == 'n':
+            value = _cast_number(value)
+            if style_id in self.date_formats:
+                try:
+                    value = from_excel(value, self.epoch, timedelta=style_id in self.timedelta_formats)
+                except (OverflowError, ValueError):
+                    value = '#VALUE!'
+        elif data_type == 's':
+            value = self.shared_strings[int(value)]
+        elif data_type == 'b':
+            value = bool(int(value))
+        elif data_type == 'd':
+            value = from_ISO8601(value)
+        return value